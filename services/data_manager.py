@@ -4,8 +4,8 @@ DataManager for CSV loading and batch management.
 Handles CSV file loading, sample status tracking, and batch loading strategy.
 """
 
-import pandas as pd
-from typing import List, Optional, Tuple
+import sys
+from typing import Dict, List, Optional, Tuple
 from models import Sample
 from utils.performance import monitor_performance
 
@@ -37,6 +37,10 @@ class DataManager:
         self.csv_path = csv_path
         self.batch_size = batch_size
         self.samples: List[Sample] = []
+        # id -> Sample 索引，状态更新时无需线性扫描
+        self._samples_by_id: Dict[str, Sample] = {}
+        # 已加载样本原始文本（instruction/output/chunk）的累计字节数，加载时一次算好
+        self._base_bytes = 0
         self.current_batch = 0
         self.total_rows = 0
         
@@ -52,13 +56,19 @@ class DataManager:
             ValueError: If required columns are missing
             UnicodeDecodeError: If encoding is invalid
         """
+        # 延迟导入：pandas 只在真正读取 CSV 时加载，
+        # 仅使用 DiffEngine/RenderEngine 的代码路径不必承担这部分导入开销
+        import pandas as pd
+        
+        encoding = 'utf-8'
         try:
             # Try UTF-8 first
-            df = pd.read_csv(self.csv_path, encoding='utf-8', nrows=1)
+            df = pd.read_csv(self.csv_path, encoding=encoding, nrows=1)
         except UnicodeDecodeError:
             # Fallback to GBK encoding
+            encoding = 'gbk'
             try:
-                df = pd.read_csv(self.csv_path, encoding='gbk', nrows=1)
+                df = pd.read_csv(self.csv_path, encoding=encoding, nrows=1)
             except Exception as e:
                 raise ValueError(f"无法读取CSV文件，编码错误: {str(e)}")
         except FileNotFoundError:
@@ -77,15 +87,15 @@ class DataManager:
             )
         
         # Get total row count accurately using pandas (only count valid data rows)
-        # This ensures we count only rows with actual data, not empty lines
+        # This ensures we count only rows with actual data, not empty lines.
+        # 只解析 instruction 一列：引号内的换行仍由 CSV 解析器正确处理，
+        # 但不必为 output/chunk 等长文本列构建对象；编码沿用上面探测的结果
         try:
-            # Read the entire CSV to get accurate row count
-            df_full = pd.read_csv(self.csv_path, encoding='utf-8')
-            # Count only non-empty rows (rows where instruction is not null)
-            self.total_rows = len(df_full[df_full['instruction'].notna()])
+            instructions = pd.read_csv(self.csv_path, encoding=encoding, usecols=['instruction'])
         except UnicodeDecodeError:
-            df_full = pd.read_csv(self.csv_path, encoding='gbk')
-            self.total_rows = len(df_full[df_full['instruction'].notna()])
+            # 首行是 UTF-8 兼容内容，但后续行不是
+            instructions = pd.read_csv(self.csv_path, encoding='gbk', usecols=['instruction'])
+        self.total_rows = int(instructions['instruction'].notna().sum())
     
     @monitor_performance("load_next_batch")
     def load_next_batch(self) -> List[Sample]:
@@ -98,6 +108,8 @@ class DataManager:
         Raises:
             ValueError: If no more batches to load
         """
+        import pandas as pd
+        
         start_idx = self.current_batch * self.batch_size
         
         if start_idx >= self.total_rows:
@@ -111,29 +123,38 @@ class DataManager:
                 self.csv_path,
                 encoding='utf-8',
                 skiprows=range(1, start_idx + 1) if start_idx > 0 else None,
-                nrows=end_idx - start_idx
+                nrows=end_idx - start_idx,
+                usecols=['instruction', 'output', 'chunk']
             )
         except UnicodeDecodeError:
             df = pd.read_csv(
                 self.csv_path,
                 encoding='gbk',
                 skiprows=range(1, start_idx + 1) if start_idx > 0 else None,
-                nrows=end_idx - start_idx
+                nrows=end_idx - start_idx,
+                usecols=['instruction', 'output', 'chunk']
             )
         
-        # Convert to Sample objects
-        new_samples = []
-        for idx, row in df.iterrows():
-            sample = Sample(
-                id=str(start_idx + len(new_samples) + 1),  # ID从1开始
-                instruction=str(row['instruction']),
-                output=str(row['output']),
-                chunk=str(row['chunk'])
+        # Convert to Sample objects（按列取值，避免 iterrows 为每行构造 Series）
+        new_samples = [
+            Sample(
+                id=str(start_idx + offset + 1),  # ID从1开始
+                instruction=str(instruction),
+                output=str(output),
+                chunk=str(chunk)
             )
-            new_samples.append(sample)
+            for offset, (instruction, output, chunk) in enumerate(zip(
+                df['instruction'].tolist(), df['output'].tolist(), df['chunk'].tolist()
+            ))
+        ]
         
         # Add to samples list
         self.samples.extend(new_samples)
+        self._samples_by_id.update((sample.id, sample) for sample in new_samples)
+        self._base_bytes += sum(
+            sys.getsizeof(sample.instruction) + sys.getsizeof(sample.output) + sys.getsizeof(sample.chunk)
+            for sample in new_samples
+        )
         self.current_batch += 1
         
         return new_samples
@@ -169,13 +190,10 @@ class DataManager:
                 f"Invalid status: {status}. Must be one of {valid_statuses}"
             )
         
-        # Find and update sample
-        for sample in self.samples:
-            if sample.id == sample_id:
-                sample.status = status
-                return
-        
-        raise ValueError(f"Sample with id {sample_id} not found")
+        sample = self._samples_by_id.get(sample_id)
+        if sample is None:
+            raise ValueError(f"Sample with id {sample_id} not found")
+        sample.status = status
     
     def get_progress(self) -> Tuple[int, int]:
         """
@@ -242,6 +260,8 @@ class DataManager:
         Yields:
             List of Sample objects for each batch
         """
+        import pandas as pd
+        
         for batch_num in range((self.total_rows + self.batch_size - 1) // self.batch_size):
             start_idx = batch_num * self.batch_size
             end_idx = min(start_idx + self.batch_size, self.total_rows)
@@ -252,26 +272,30 @@ class DataManager:
                     self.csv_path,
                     encoding='utf-8',
                     skiprows=range(1, start_idx + 1) if start_idx > 0 else None,
-                    nrows=end_idx - start_idx
+                    nrows=end_idx - start_idx,
+                    usecols=['instruction', 'output', 'chunk']
                 )
             except UnicodeDecodeError:
                 df = pd.read_csv(
                     self.csv_path,
                     encoding='gbk',
                     skiprows=range(1, start_idx + 1) if start_idx > 0 else None,
-                    nrows=end_idx - start_idx
+                    nrows=end_idx - start_idx,
+                    usecols=['instruction', 'output', 'chunk']
                 )
             
             # Convert to Sample objects
-            batch_samples = []
-            for idx, row in df.iterrows():
-                sample = Sample(
-                    id=str(start_idx + len(batch_samples)),
-                    instruction=str(row['instruction']),
-                    output=str(row['output']),
-                    chunk=str(row['chunk'])
+            batch_samples = [
+                Sample(
+                    id=str(start_idx + offset + 1),  # ID从1开始，与 load_next_batch 一致
+                    instruction=str(instruction),
+                    output=str(output),
+                    chunk=str(chunk)
                 )
-                batch_samples.append(sample)
+                for offset, (instruction, output, chunk) in enumerate(zip(
+                    df['instruction'].tolist(), df['output'].tolist(), df['chunk'].tolist()
+                ))
+            ]
             
             yield batch_samples
     
@@ -282,19 +306,13 @@ class DataManager:
         Returns:
             Dictionary with memory usage statistics
         """
-        import sys
-        
-        total_size = 0
+        # 原始文本在加载后不再改变，只需扫描编辑产生的字段
+        total_size = self._base_bytes
         for sample in self.samples:
-            total_size += sys.getsizeof(sample.instruction)
-            total_size += sys.getsizeof(sample.output)
-            total_size += sys.getsizeof(sample.chunk)
-            if hasattr(sample, 'edited_instruction') and sample.edited_instruction:
-                total_size += sys.getsizeof(sample.edited_instruction)
-            if hasattr(sample, 'edited_output') and sample.edited_output:
-                total_size += sys.getsizeof(sample.edited_output)
-            if hasattr(sample, 'diff_result') and sample.diff_result:
-                total_size += sys.getsizeof(sample.diff_result)
+            for text in (sample.edited_instruction, sample.edited_output,
+                         getattr(sample, 'diff_result', None)):
+                if text:
+                    total_size += sys.getsizeof(text)
         
         return {
             'total_bytes': total_size,
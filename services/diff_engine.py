@@ -19,6 +19,9 @@ class DiffEngine:
     <false> tags for deletions and <true> tags for additions.
     """
     
+    # 单个文本允许的最大字符数，超过时拒绝计算差异
+    MAX_TEXT_LENGTH = 100000
+    
     def __init__(self):
         """Initialize DiffEngine."""
         pass
@@ -48,8 +51,8 @@ class DiffEngine:
             TimeoutError: If computation takes too long
         """
         # Validate input lengths
-        if len(original) > 100000 or len(modified) > 100000:
-            raise ValueError("文本过长，请分段处理（最大 100,000 字符）")
+        if len(original) > self.MAX_TEXT_LENGTH or len(modified) > self.MAX_TEXT_LENGTH:
+            raise ValueError(f"文本过长，请分段处理（最大 {self.MAX_TEXT_LENGTH:,} 字符）")
         
         # Handle empty strings
         if not original and not modified:
@@ -10,6 +10,13 @@ from datetime import datetime
 from typing import List, Dict, Any
 from models import Sample
 
+try:
+    # 可选加速（未安装时使用 json 模块）：导出数据只含 str/list/dict，
+    # 对这类数据 orjson 输出与 json.dumps(ensure_ascii=False, indent=2) 逐字节一致
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class ExportManager:
     """
@@ -72,6 +79,34 @@ class ExportManager:
             # 添加新样本
             self.corrected_samples.append(sample)
     
+    def add_samples(self, samples: List[Sample]):
+        """
+        Add several corrected samples to the export queue at once.
+        与逐个调用 add_sample 结果相同，但只建立一次 id 索引。
+        
+        Args:
+            samples: Sample objects to add
+        
+        Raises:
+            ValueError: If any sample status is not 'corrected'
+        """
+        for sample in samples:
+            if sample.status != "corrected":
+                raise ValueError(
+                    f"Only corrected samples can be exported. "
+                    f"Sample {sample.id} has status: {sample.status}"
+                )
+        
+        # id -> 队列位置，避免每个样本都线性扫描
+        positions = {s.id: i for i, s in enumerate(self.corrected_samples)}
+        for sample in samples:
+            index = positions.get(sample.id)
+            if index is not None:
+                self.corrected_samples[index] = sample
+            else:
+                positions[sample.id] = len(self.corrected_samples)
+                self.corrected_samples.append(sample)
+    
     def export_to_json(self, original_filename: str) -> str:
         """
         Generate JSON export file.
@@ -97,22 +132,11 @@ class ExportManager:
         base_name = os.path.splitext(original_filename)[0]
         output_filename = f"{base_name}_{timestamp}_{count}.json"
         
-        # Convert samples to selected format
-        data = []
-        for sample in self.corrected_samples:
-            if self.format == "messages":
-                data.append(self.format_messages(sample))
-            elif self.format == "alpaca":
-                data.append(self.format_alpaca(sample))
-            elif self.format == "sharegpt":
-                data.append(self.format_sharegpt(sample))
-            elif self.format == "query-response":
-                data.append(self.format_query_response(sample))
-        
-        # Write to file
+        # 先在内存中序列化，再一次性写入文件
         try:
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            payload = self.to_json_bytes()
+            with open(output_filename, 'wb') as f:
+                f.write(payload)
         except PermissionError:
             raise PermissionError(f"无法写入文件: {output_filename}")
         except Exception as e:
@@ -120,6 +144,39 @@ class ExportManager:
         
         return output_filename
     
+    def to_json_bytes(self) -> bytes:
+        """
+        Serialize queued samples to the UTF-8 JSON that export_to_json writes.
+        
+        Uses orjson when it is installed. The formatters only emit str, list
+        and dict values, for which orjson's output is byte-identical to
+        json.dumps(ensure_ascii=False, indent=2); other value types (floats,
+        non-str keys) would not be guaranteed to match.
+        
+        Returns:
+            Indented JSON document as bytes
+        """
+        data = self.build_export_data()
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    def build_export_data(self) -> List[Dict[str, Any]]:
+        """
+        Convert queued samples to the selected format without writing a file.
+        
+        Returns:
+            List of dictionaries in the order samples were queued
+        """
+        # 格式在循环外确定一次
+        formatter = {
+            "messages": self.format_messages,
+            "alpaca": self.format_alpaca,
+            "sharegpt": self.format_sharegpt,
+            "query-response": self.format_query_response,
+        }[self.format]
+        return [formatter(sample) for sample in self.corrected_samples]
+    
     def format_messages(self, sample: Sample) -> Dict[str, Any]:
         """
         Convert sample to Messages format (OpenAI-style).
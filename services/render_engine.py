@@ -6,9 +6,154 @@ Supports multiple LaTeX formats for better compatibility.
 """
 
 import re
-import html
-import markdown
-import uuid
+import threading
+from functools import lru_cache
+
+
+# 与 html.escape(quote=True) 等价的转义表，str.translate 单次扫描完成全部替换
+_HTML_ESCAPE_FULL = str.maketrans({
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#x27;',
+})
+
+# LaTeX占位符的固定前后缀：Unicode私用区字符，对Markdown没有任何含义，
+# 不会像HTML注释那样在行首被当作原始HTML块处理，也远短于注释格式
+_PLACEHOLDER_PREFIX = '\ue000'
+_PLACEHOLDER_SUFFIX = '\ue001'
+_PLACEHOLDER_RE = re.compile(re.escape(_PLACEHOLDER_PREFIX) + r'(\d+)' + re.escape(_PLACEHOLDER_SUFFIX))
+
+# 差异标签样式：<false>为删除内容（红色删除线），<true>为新增内容（绿色）
+_FALSE_SPAN_OPEN = '<span style="color: #d32f2f; text-decoration: line-through; background: #ffebee; padding: 2px 4px; border-radius: 3px;">'
+_TRUE_SPAN_OPEN = '<span style="color: #388e3c; background: #e8f5e9; padding: 2px 4px; border-radius: 3px;">'
+_SPAN_CLOSE = '</span>'
+
+
+# 行边界：换行（含其后的空行），连同下一行行首的缩进以及列表、引用、标题标记；
+# 差异span在此处关闭，在这些标记之后重新打开
+_LINE_BREAK_RE = re.compile(
+    r'\n(?:[ \t]*\n)*(?:[ \t]*(?:(?:[*+-]|\d+\.)[ \t]+|>[ \t]?|#{1,6}[ \t]+))*[ \t]*'
+)
+
+# (开始标签, 结束标签, span开始标签)
+_DIFF_TAGS = (
+    ('<false>', '</false>', _FALSE_SPAN_OPEN),
+    ('<true>', '</true>', _TRUE_SPAN_OPEN),
+)
+
+
+def _may_contain_latex(text: str) -> bool:
+    """是否可能含有LaTeX分隔符（子串查找，供跳过正则扫描的快速路径使用）"""
+    return ('$' in text or '\\[' in text
+            or '\\(' in text or '\\begin{' in text)
+
+
+def _has_diff_tags(text: str) -> bool:
+    """是否含有 <false>/<true> 差异标签"""
+    return '<false>' in text or '<true>' in text
+
+
+def _iter_diff_tags(text: str):
+    """
+    从左到右逐个产出最外层差异标签 (开始位置, 标签体开始, 结束标签位置, _DIFF_TAGS 项)
+    
+    配对方式与正则 <false>(.*?)</false>|<true>(.*?)</true> 相同：取最靠前的开始标签，
+    与其后第一个同名结束标签配对；未闭合的开始标签跳过。只用 str.find，不经过正则。
+    """
+    # 各开始标签下一次出现的位置，只在被越过时才重新查找
+    positions = [text.find(open_tag) for open_tag, _, _ in _DIFF_TAGS]
+    search = 0
+    while True:
+        start = -1
+        for i, (open_tag, _, _) in enumerate(_DIFF_TAGS):
+            if -1 < positions[i] < search:
+                positions[i] = text.find(open_tag, search)
+            if positions[i] != -1 and (start == -1 or positions[i] < start):
+                start, tag = positions[i], _DIFF_TAGS[i]
+        if start == -1:
+            return
+        
+        body_start = start + len(tag[0])
+        end = text.find(tag[1], body_start)
+        if end == -1:
+            # 未闭合的开始标签按原文保留，从标签之后继续查找
+            search = body_start
+            continue
+        yield start, body_start, end, tag
+        search = end + len(tag[1])
+
+
+def _style_diff_tags(text: str, split_lines: bool = False) -> str:
+    """
+    将文本中的 <false>/<true> 差异标签全部替换为带样式的span，标签体递归处理
+    
+    split_lines 为 True 时（交给Markdown转换的文本），span在每个换行处关闭，
+    并在下一行的列表/引用/标题标记之后重新打开：标签体跨越段落、列表项或
+    标题时，生成的HTML仍然正确嵌套。
+    """
+    if '<false>' not in text and '<true>' not in text:
+        return text
+    
+    out = []
+    pos = 0
+    for start, body_start, end, (open_tag, close_tag, span_open) in _iter_diff_tags(text):
+        body = _style_diff_tags(text[body_start:end], split_lines)
+        if split_lines and '\n' in body:
+            body = _LINE_BREAK_RE.sub(
+                lambda m: ''.join((_SPAN_CLOSE, m.group(), span_open)), body
+            )
+        out.append(text[pos:start])
+        out.append(span_open)
+        out.append(body)
+        out.append(_SPAN_CLOSE)
+        pos = end + len(close_tag)
+    
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+# 对Markdown有意义的字符（含其内部占位用的 \x02/\x03）；不含这些字符、
+# 且不以4个空格缩进开头的块，转换结果必然是单个段落，可跳过Markdown解析
+_MD_SIGNIFICANT = frozenset('\\`*_[](){}#+-.!<>&|~=:\n\r\t\x02\x03')
+
+# 列表项起始（无序/有序），用于分块时将列表续项并入前一块
+_LIST_ITEM_RE = re.compile(r'(?:[*+-]|\d+\.)[ \t]')
+
+# 引用块起始，连续的引用块跨空行属于同一个 <blockquote>
+_BLOCKQUOTE_RE = re.compile(r' {0,3}>')
+
+# 块分隔符：一个或多个空行，切分时保留原始分隔符，合并时原样拼回
+_BLOCK_SEPARATOR_RE = re.compile(r'(\n{2,})')
+
+# 与 fenced_code 扩展相同的围栏代码块模式：该扩展在预处理阶段对全文匹配，
+# 围栏只在行首生效，结束围栏必须与开始围栏完全相同（行内的 ``` 不算围栏）
+_FENCED_BLOCK_RE = re.compile(
+    r'(?P<fence>^(?:~{3,}|`{3,}))[ ]*'
+    r'((\{(?P<attrs>[^\n]*)\})|'
+    r'(\.?(?P<lang>[\w#.+-]*)[ ]*)?'
+    r'(hl_lines=(?P<quot>"|\')(?P<hl_lines>.*?)(?P=quot)[ ]*)?)'
+    r'\n'
+    r'(?P<code>.*?)(?<=\n)'
+    r'(?P=fence)[ ]*$',
+    re.MULTILINE | re.DOTALL
+)
+# 行首的围栏行；去掉完整的围栏代码块后仍有剩余，说明有围栏可能延续到后面的块
+_FENCE_LINE_RE = re.compile(r'^(?:~{3,}|`{3,})', re.M)
+
+# 补在块后检测跨块公式：空行之后依次是每种公式的结束符，
+# 块内任一未闭合的公式都会延伸到这里，块内已闭合的公式不受影响
+_LATEX_CLOSERS = '\n\n$$\\]\\)\\end{equation}\\end{align}\\end{gather}'
+
+# 同理用于检测跨块的差异标签
+_DIFF_CLOSERS = '\n\n</false></true>'
+
+# 分块渲染与整体渲染不等价的结构：链接引用/脚注定义（作用于全文）、
+# 行首原始HTML块（可跨空行，差异标签除外）；含有这些结构时整体转换
+_WHOLE_DOCUMENT_RE = re.compile(
+    r'^ {0,3}(?:\[[^\]\n]+\]:|<(?!/?(?:false|true)>)[A-Za-z!?/])', re.M
+)
 
 
 class RenderEngine:
@@ -23,36 +168,64 @@ class RenderEngine:
     """
     
     # LaTeX 分隔符模式 - 支持多种格式
+    # 公式内容使用"非结束符"字符类展开（[^x]*(?:x(?!end)[^x]*)*），
+    # 而不是 .+? 懒惰匹配，正则引擎可以整段扫描普通字符，无需逐字符回溯；
+    # 开头的否定前瞻保证公式内容非空
+    # 类加载时预编译，调用时不再经过 re 模块的模式缓存查找；
+    # 模式中没有 . ，否定字符类本身就能跨行匹配，无需 DOTALL
     LATEX_PATTERNS = [
         # Display math: $$...$$
-        (r'\$\$(.+?)\$\$', 'display'),
+        (re.compile(r'\$\$(?!\$\$)([^$]*(?:\$(?!\$)[^$]*)*)\$\$'), 'display'),
         # Display math: \[...\]
-        (r'\\\[(.+?)\\\]', 'display'),
-        # Inline math: $...$  (非贪婪，避免跨行匹配)
-        (r'\$([^\$\n]+?)\$', 'inline'),
+        (re.compile(r'\\\[(?!\\\])([^\\]*(?:\\(?!\])[^\\]*)*)\\\]'), 'display'),
+        # Inline math: $...$  (字符类已排除 $ 和换行，贪婪匹配即可，不跨行)
+        (re.compile(r'\$([^$\n]+)\$'), 'inline'),
         # Inline math: \(...\)
-        (r'\\\((.+?)\\\)', 'inline'),
+        (re.compile(r'\\\((?!\\\))([^\\]*(?:\\(?!\))[^\\]*)*)\\\)'), 'inline'),
         # Display math: \begin{equation}...\end{equation}
-        (r'\\begin\{equation\}(.+?)\\end\{equation\}', 'display'),
+        (re.compile(r'\\begin\{equation\}(?!\\end\{equation\})([^\\]*(?:\\(?!end\{equation\})[^\\]*)*)\\end\{equation\}'), 'display'),
         # Display math: \begin{align}...\end{align}
-        (r'\\begin\{align\*?\}(.+?)\\end\{align\*?\}', 'display'),
+        (re.compile(r'\\begin\{align\*?\}(?!\\end\{align\*?\})([^\\]*(?:\\(?!end\{align\*?\})[^\\]*)*)\\end\{align\*?\}'), 'display'),
         # Display math: \begin{gather}...\end{gather}
-        (r'\\begin\{gather\*?\}(.+?)\\end\{gather\*?\}', 'display'),
+        (re.compile(r'\\begin\{gather\*?\}(?!\\end\{gather\*?\})([^\\]*(?:\\(?!end\{gather\*?\})[^\\]*)*)\\end\{gather\*?\}'), 'display'),
     ]
     
+    # 渲染结果外层容器的固定前后缀（data-katex-render="true" 供KaTeX查找渲染目标）
+    _WRAPPER_PREFIX = (
+        '<div class="reference-content katex-render-target" data-katex-render="true" '
+        'style="font-size: 18px; line-height: 1.8; padding: 15px;">'
+    )
+    _DIFF_WRAPPER_PREFIX = '<div class="katex-render-target" data-katex-render="true">'
+    _WRAPPER_SUFFIX = '</div>'
+    # 渲染失败时的纯文本回退容器（不含模板缩进空白）
+    _FALLBACK_PREFIX = (
+        '<div class="reference-content" style="font-size: 18px; line-height: 1.8; padding: 15px;">'
+        '<pre style="white-space: pre-wrap; word-wrap: break-word;">'
+    )
+    _FALLBACK_SUFFIX = '</pre></div>'
+    
+    # Markdown扩展：只启用参考内容实际用到的表格和围栏代码块，
+    # 不加载 extra 中的 abbr/attr_list/def_list/footnotes/md_in_html，减少每次转换的处理器数量
+    MARKDOWN_EXTENSIONS = ['tables', 'fenced_code', 'nl2br', 'sane_lists']
+    
+    # 实例只持有Markdown处理器，固定槽位省去每个实例的 __dict__
+    __slots__ = ('md',)
+    
     def __init__(self):
-        """Initialize RenderEngine with Markdown processor."""
-        self.md = markdown.Markdown(extensions=['extra', 'nl2br', 'sane_lists'])
+        """Initialize RenderEngine; the Markdown processor is built on first conversion."""
+        # 公共渲染方法都经由线程独占引擎转换，处理器只在真正转换的实例上创建，
+        # 事件处理函数每次新建 RenderEngine 不再付出构造Markdown的开销
+        self.md = None
     
-    def _escape_html_in_latex(self, latex_content: str) -> str:
-        """
-        转义 LaTeX 内容中的 HTML 特殊字符，但保留 LaTeX 命令
-        """
-        # 只转义 < 和 > 以防止 HTML 注入，但保留其他字符
-        result = latex_content.replace('&', '&amp;')
-        result = result.replace('<', '&lt;')
-        result = result.replace('>', '&gt;')
-        return result
+    def _get_markdown(self):
+        """返回本实例的Markdown处理器（首次转换时创建）"""
+        md = self.md
+        if md is None:
+            # 延迟导入：markdown 及其扩展注册表只在首次转换时加载，
+            # 仅使用 services 中数据/导出功能的代码路径不必承担这部分导入开销
+            import markdown
+            md = self.md = markdown.Markdown(extensions=self.MARKDOWN_EXTENSIONS)
+        return md
     
     def _protect_latex(self, text: str) -> tuple:
         """
@@ -64,40 +237,35 @@ class RenderEngine:
         if not text:
             return text, []
         
+        # 快速路径：不含任何分隔符的纯文本直接返回（C层子串查找，远快于正则扫描）
+        if not _may_contain_latex(text):
+            return text, []
+        
+        # 所有模式合并为一个正则，单次扫描；同一位置按 LATEX_PATTERNS 顺序尝试（display 优先）
+        # 直接遍历匹配拼接结果，无需为 re.sub 构造回调闭包
         latex_placeholders = []
-        placeholder_index = [0]  # 使用列表以便在闭包中修改
-        
-        def replace_latex(match, display_type):
-            """替换 LaTeX 为占位符"""
-            formula = match.group(1).strip()
-            # 使用HTML注释格式的占位符,避免被Markdown解析
-            unique_id = str(uuid.uuid4()).replace('-', '')
-            placeholder = f"<!--LATEX_{unique_id}-->"
-            latex_placeholders.append({
-                'placeholder': placeholder,
-                'formula': formula,
-                'display': display_type,
-                'original': match.group(0)
-            })
-            placeholder_index[0] += 1
-            return placeholder
-        
-        result = text
-        
-        # 按顺序处理各种 LaTeX 模式（先处理 display，再处理 inline）
-        for pattern, display_type in self.LATEX_PATTERNS:
-            try:
-                result = re.sub(
-                    pattern,
-                    lambda m, dt=display_type: replace_latex(m, dt),
-                    result,
-                    flags=re.DOTALL
-                )
-            except re.error:
-                # 如果正则表达式出错，跳过该模式
-                continue
+        parts = []
+        last_end = 0
+        for match in _LATEX_RE.finditer(text):
+            formula_group, display_type = _LATEX_GROUPS[match.lastgroup]
+            formula = match.group(formula_group).strip()
+            # 使用私用区字符包裹的占位符,避免被Markdown解析
+            # 占位符只需在本次调用内唯一，用其在列表中的下标即可
+            placeholder = f"{_PLACEHOLDER_PREFIX}{len(latex_placeholders)}{_PLACEHOLDER_SUFFIX}"
+            # 保存 (占位符, 恢复文本) 元组，恢复格式在此一次确定，避免每个公式分配字典
+            if display_type == 'display':
+                latex_placeholders.append((placeholder, f'$${formula}$$'))
+            else:
+                latex_placeholders.append((placeholder, f'${formula}$'))
+            parts.append(text[last_end:match.start()])
+            parts.append(placeholder)
+            last_end = match.end()
         
-        return result, latex_placeholders
+        if not latex_placeholders:
+            return text, []
+        
+        parts.append(text[last_end:])
+        return ''.join(parts), latex_placeholders
 
     def _restore_latex(self, html_text: str, latex_placeholders: list) -> str:
         """
@@ -107,24 +275,120 @@ class RenderEngine:
         ⚠️ 关键修复：LaTeX公式周围的HTML实体需要保持转义状态
         但公式内部的内容不需要额外处理，KaTeX会正确渲染
         """
-        result = html_text
+        # 直接恢复原始LaTeX格式，让KaTeX的auto-render处理
+        # 不进行HTML转义，因为这些内容会被KaTeX JavaScript处理
+        if not latex_placeholders:
+            return html_text
         
-        for item in latex_placeholders:
-            placeholder = item['placeholder']
-            formula = item['formula']
-            display_type = item['display']
-            original = item['original']
-            
-            # 直接恢复原始LaTeX格式，让KaTeX的auto-render处理
-            # 不进行HTML转义，因为这些内容会被KaTeX JavaScript处理
-            if display_type == 'display':
-                latex_html = f'$${formula}$$'
+        # 只有一个公式（最常见）时直接替换，无需正则
+        if len(latex_placeholders) == 1:
+            placeholder, replacement = latex_placeholders[0]
+            return html_text.replace(placeholder, replacement)
+        
+        # 按占位符切分一次：奇数下标为占位符序号（即其在列表中的下标），
+        # 直接换成保护阶段生成的恢复文本后整体拼接，无需逐个匹配回调
+        parts = _PLACEHOLDER_RE.split(html_text)
+        count = len(latex_placeholders)
+        for i in range(1, len(parts), 2):
+            index = int(parts[i])
+            if index < count:
+                parts[i] = latex_placeholders[index][1]
             else:
-                latex_html = f'${formula}$'
-            
-            result = result.replace(placeholder, latex_html)
+                parts[i] = f"{_PLACEHOLDER_PREFIX}{parts[i]}{_PLACEHOLDER_SUFFIX}"
+        return ''.join(parts)
+    
+    def _split_blocks(self, text: str) -> list:
+        """
+        按Markdown段落边界（空行）切分文本
+        
+        跨越空行的结构（$$...$$、\\[...\\]、\\begin...\\end、代码围栏、差异标签）
+        以及缩进续行、列表项、引用块会连同原始分隔符并入前一块；含链接引用定义或
+        原始HTML块时不分块。各块转换结果以换行拼接后与整体转换一致。
+        
+        Returns:
+            Markdown块列表
+        """
+        if _WHOLE_DOCUMENT_RE.search(text):
+            return [text]
+        
+        # 奇数下标为分隔符（连续空行），偶数下标为块内容
+        parts = _BLOCK_SEPARATOR_RE.split(text)
+        blocks = [parts[0]]
+        for i in range(1, len(parts), 2):
+            separator, part = parts[i], parts[i + 1]
+            if (
+                self._is_open_block(blocks[-1])
+                # 只含空白的首块（如单独一行Tab）在整体转换中会影响后续内容
+                or not blocks[-1].strip()
+                or part[:1] in (' ', '\t')
+                or _LIST_ITEM_RE.match(part)
+                or _BLOCKQUOTE_RE.match(part)
+            ):
+                blocks[-1] = blocks[-1] + separator + part
+            else:
+                blocks.append(part)
+        return blocks
+    
+    def _is_open_block(self, block: str) -> bool:
+        """判断块内是否存在未闭合、会延续到下一块的结构"""
+        return (
+            (_may_contain_latex(block) and self._has_open_latex(block))
+            or (('```' in block or '~~~' in block)
+                and _FENCE_LINE_RE.search(_FENCED_BLOCK_RE.sub('', block)) is not None)
+            # 差异标签可能跨段落，切开后两半都无法成对替换
+            or (_has_diff_tags(block) and self._has_open_diff_tag(block))
+        )
+    
+    def _has_open_latex(self, block: str) -> bool:
+        """判断块内是否有公式在整体渲染时会与后续块中的结束符配对"""
+        end = len(block)
+        for match in _LATEX_RE.finditer(block + _LATEX_CLOSERS):
+            if match.start() >= end:
+                return False
+            if match.end() > end:
+                return True
+        return False
+    
+    def _has_open_diff_tag(self, block: str) -> bool:
+        """判断块内是否有差异标签在整体渲染时会与后续块中的结束标签配对"""
+        # 差异标签在保护LaTeX后的文本上配对（公式内的标签不参与）
+        protected_text = self._protect_latex(block)[0]
+        end = len(protected_text)
+        return any(
+            close_start >= end
+            for _, _, close_start, _ in _iter_diff_tags(protected_text + _DIFF_CLOSERS)
+        )
+    
+    def _convert_block(self, block: str, with_diff: bool = False) -> str:
+        """
+        渲染单个Markdown块：保护LaTeX → (差异标签样式) → 转换Markdown → 恢复LaTeX
+        
+        LaTeX只保护/恢复一次，差异标签在保护后的文本上替换，再整体交给Markdown。
+        
+        Args:
+            block: 单个Markdown块
+            with_diff: 是否同时渲染 <false>/<true> 差异标签
         
-        return result
+        Returns:
+            该块的HTML
+        """
+        protected_text, latex_placeholders = self._protect_latex(block)
+        if with_diff:
+            protected_text = _style_diff_tags(protected_text, split_lines=True)
+        
+        if _MD_SIGNIFICANT.isdisjoint(protected_text) and not protected_text.startswith('    '):
+            # 快速路径：纯文本块与 Markdown 输出一致（去掉行首空白后包成段落）；
+            # 缩进4个空格以上的块是缩进代码块，必须交给Markdown
+            protected_text = protected_text.lstrip()
+            html_content = f'<p>{protected_text}</p>' if protected_text else ''
+        else:
+            md = self._get_markdown()
+            html_content = md.convert(protected_text)
+            md.reset()
+        
+        html_content = self._restore_latex(html_content, latex_placeholders)
+        
+        return html_content
     
     def render_markdown_latex(self, text: str) -> str:
         """
@@ -142,36 +406,31 @@ class RenderEngine:
         if not text:
             return ""
         
+        # 渲染结果按输入文本缓存（所有实例共享），重复渲染同一文本直接命中
+        return _render_markdown_latex_cached(text, False)
+    
+    def _render_markdown_latex(self, text: str, with_diff: bool = False) -> str:
+        """渲染Markdown和LaTeX，with_diff时同时渲染差异标签（不经过缓存）"""
         try:
-            # 1. 保护 LaTeX 公式
-            protected_text, latex_placeholders = self._protect_latex(text)
-            
-            # 2. 渲染 Markdown
-            html_content = self.md.convert(protected_text)
-            
-            # 3. 恢复 LaTeX 公式
-            if latex_placeholders:
-                html_content = self._restore_latex(html_content, latex_placeholders)
-            
-            # 4. 重置 Markdown 处理器
-            self.md.reset()
+            # 按段落分块渲染，每块结果按文本缓存，编辑只会使变化的块失效
+            html_content = '\n'.join(
+                block_html
+                for block_html in (
+                    _render_block(block, with_diff) for block in self._split_blocks(text)
+                )
+                if block_html
+            )
             
             # ========== 关键步骤：标记LaTeX渲染容器 ==========
             # ⚠️ data-katex-render="true" 让JavaScript能找到并渲染LaTeX
             # 不要移除这个属性，否则LaTeX无法渲染！
-            return f'''
-            <div class="reference-content katex-render-target" data-katex-render="true" style="font-size: 18px; line-height: 1.8; padding: 15px;">
-                {html_content}
-            </div>
-            '''
+            prefix = self._DIFF_WRAPPER_PREFIX if with_diff else self._WRAPPER_PREFIX
+            return ''.join((prefix, html_content, self._WRAPPER_SUFFIX))
         except Exception as e:
             # 如果渲染失败，返回原始文本（HTML转义）
-            escaped_text = html.escape(text)
-            return f'''
-            <div class="reference-content" style="font-size: 18px; line-height: 1.8; padding: 15px;">
-                <pre style="white-space: pre-wrap; word-wrap: break-word;">{escaped_text}</pre>
-            </div>
-            '''
+            return ''.join((
+                self._FALLBACK_PREFIX, text.translate(_HTML_ESCAPE_FULL), self._FALLBACK_SUFFIX
+            ))
     
     def render_diff_tags(self, text: str) -> str:
         """
@@ -192,40 +451,38 @@ class RenderEngine:
         if not text:
             return ""
         
+        # 渲染结果按输入文本缓存（所有实例共享）
+        return _render_diff_tags_cached(text)
+    
+    def _render_diff_tags(self, text: str) -> str:
+        """渲染差异标签和LaTeX（不经过缓存）"""
+        # 快速路径：既无差异标签也无公式时，内容原样包装即可
+        if not _has_diff_tags(text) and not _may_contain_latex(text):
+            return ''.join((self._DIFF_WRAPPER_PREFIX, text, self._WRAPPER_SUFFIX))
+        
         # 1. 先保护LaTeX公式
         protected_text, latex_placeholders = self._protect_latex(text)
         
-        # 2. Replace <false> tags with styled spans
-        protected_text = re.sub(
-            r'<false>(.*?)</false>',
-            r'<span style="color: #d32f2f; text-decoration: line-through; background: #ffebee; padding: 2px 4px; border-radius: 3px;">\1</span>',
-            protected_text,
-            flags=re.DOTALL
-        )
-        
-        # 3. Replace <true> tags with styled spans
-        protected_text = re.sub(
-            r'<true>(.*?)</true>',
-            r'<span style="color: #388e3c; background: #e8f5e9; padding: 2px 4px; border-radius: 3px;">\1</span>',
-            protected_text,
-            flags=re.DOTALL
-        )
+        # 2. 替换 <false>/<true> 标签为带样式的span
+        protected_text = _style_diff_tags(protected_text)
         
-        # 4. 恢复LaTeX公式
-        if latex_placeholders:
-            protected_text = self._restore_latex(protected_text, latex_placeholders)
+        # 3. 恢复LaTeX公式
+        protected_text = self._restore_latex(protected_text, latex_placeholders)
         
         # ========== 关键：标记diff内容中的LaTeX ==========
         # ⚠️ data-katex-render="true" 确保差异显示中的LaTeX也能被渲染
-        return f'<div class="katex-render-target" data-katex-render="true">{protected_text}</div>'
+        return ''.join((self._DIFF_WRAPPER_PREFIX, protected_text, self._WRAPPER_SUFFIX))
     
     def render_markdown_latex_with_diff(self, text: str) -> str:
         """
         Render text with both Markdown/LaTeX and diff tag styling.
         
-        This combines both rendering operations:
-        1. First apply diff tag styling
-        2. Then render Markdown and LaTeX
+        Runs a single fused pipeline so LaTeX is protected and restored
+        only once:
+        1. Protect LaTeX formulas
+        2. Apply diff tag styling
+        3. Render Markdown
+        4. Restore LaTeX formulas
         
         Args:
             text: Text with Markdown, LaTeX, and diff tags
@@ -233,10 +490,21 @@ class RenderEngine:
         Returns:
             Fully rendered HTML
         """
-        # First apply diff tag styling
-        html_content = self.render_diff_tags(text)
+        if not text:
+            return ""
+        
+        return _render_markdown_latex_cached(text, True)
+    
+    def clear_render_cache(self) -> None:
+        """
+        Drop all cached render output.
         
-        return html_content
+        The caches are shared by every RenderEngine instance; call this after
+        changing rendering configuration so stale HTML is not served.
+        """
+        _render_markdown_latex_cached.cache_clear()
+        _render_diff_tags_cached.cache_clear()
+        _render_block.cache_clear()
     
     def inject_wysiwyg_controls(self) -> str:
         """
@@ -249,78 +517,7 @@ class RenderEngine:
         Returns:
             JavaScript code as string
         """
-        js_code = """
-        <script>
-        // WYSIWYG Editing Controls
-        
-        function insertMarkdown(textarea, prefix, suffix) {
-            const start = textarea.selectionStart;
-            const end = textarea.selectionEnd;
-            const selectedText = textarea.value.substring(start, end);
-            const before = textarea.value.substring(0, start);
-            const after = textarea.value.substring(end);
-            
-            textarea.value = before + prefix + selectedText + suffix + after;
-            
-            // Set cursor position
-            const newPos = start + prefix.length + selectedText.length + suffix.length;
-            textarea.setSelectionRange(newPos, newPos);
-            textarea.focus();
-            
-            // Trigger change event
-            textarea.dispatchEvent(new Event('input', { bubbles: true }));
-        }
-        
-        function makeBold(textarea) {
-            insertMarkdown(textarea, '**', '**');
-        }
-        
-        function makeItalic(textarea) {
-            insertMarkdown(textarea, '*', '*');
-        }
-        
-        function makeList(textarea) {
-            const start = textarea.selectionStart;
-            const end = textarea.selectionEnd;
-            const selectedText = textarea.value.substring(start, end);
-            const lines = selectedText.split('\\n');
-            const listText = lines.map(line => '- ' + line).join('\\n');
-            
-            const before = textarea.value.substring(0, start);
-            const after = textarea.value.substring(end);
-            
-            textarea.value = before + listText + after;
-            textarea.focus();
-            textarea.dispatchEvent(new Event('input', { bubbles: true }));
-        }
-        
-        // Keyboard shortcuts
-        document.addEventListener('keydown', function(e) {
-            const target = e.target;
-            if (target.tagName !== 'TEXTAREA') return;
-            
-            // Ctrl+B for bold
-            if (e.ctrlKey && e.key === 'b') {
-                e.preventDefault();
-                makeBold(target);
-            }
-            
-            // Ctrl+I for italic
-            if (e.ctrlKey && e.key === 'i') {
-                e.preventDefault();
-                makeItalic(target);
-            }
-            
-            // Ctrl+L for list
-            if (e.ctrlKey && e.key === 'l') {
-                e.preventDefault();
-                makeList(target);
-            }
-        });
-        </script>
-        """
-        
-        return js_code
+        return _WYSIWYG_JS
 
     def get_katex_header(self) -> str:
         """
@@ -336,363 +533,505 @@ class RenderEngine:
         Returns:
             HTML string with KaTeX CDN links and auto-render configuration
         """
-        import time
-        import random
-        # 添加随机数+时间戳来强制浏览器每次都重新加载
-        cache_buster = str(int(time.time() * 1000)) + str(random.randint(1000, 9999))
-        
-        # ========== 手动控制加载顺序，避免竞态条件 ==========
-        # 先加载CSS，然后按顺序加载JS
-        header = '''
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
-        <script>
-        // 手动顺序加载 KaTeX 库
-        (function() {
-            console.log("🔧 开始加载 KaTeX 库...");
-            
-            // 第一步：加载 KaTeX 核心
-            var katexScript = document.createElement('script');
-            katexScript.src = 'https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js';
-            katexScript.onload = function() {
-                console.log("✅ KaTeX 核心加载成功");
-                console.log("   window.katex:", typeof window.katex);
-                console.log("   katex.render:", typeof window.katex.render);
-                
-                // 验证 KaTeX 对象已正确初始化
-                if (typeof window.katex === 'undefined') {
-                    console.error("❌ window.katex 未定义");
-                    tryBackupCDN();
-                    return;
-                }
-                
-                // 第二步：加载 auto-render
-                loadAutoRender();
-            };
-            katexScript.onerror = function() {
-                console.error("❌ KaTeX 核心加载失败，尝试备用CDN");
-                tryBackupCDN();
-            };
-            document.head.appendChild(katexScript);
-            
-            function loadAutoRender() {
-                console.log("🔧 开始加载 auto-render...");
-                var autoRenderScript = document.createElement('script');
-                autoRenderScript.src = 'https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js';
-                autoRenderScript.onload = function() {
-                    console.log("✅ auto-render 加载成功");
-                    console.log("   renderMathInElement:", typeof renderMathInElement);
-                    
-                    // 验证函数已定义
-                    if (typeof renderMathInElement === 'undefined') {
-                        console.error("❌ renderMathInElement 未定义");
-                        return;
-                    }
-                    
-                    // 第三步：初始化渲染
-                    initKaTeXRendering();
-                };
-                autoRenderScript.onerror = function() {
-                    console.error("❌ auto-render 加载失败");
-                };
-                document.head.appendChild(autoRenderScript);
-            }
-            
-            function tryBackupCDN() {
-                console.log("🔄 尝试备用 CDN (cdnjs)...");
-                var backupScript = document.createElement('script');
-                backupScript.src = 'https://cdnjs.cloudflare.com/ajax/libs/KaTeX/0.16.9/katex.min.js';
-                backupScript.onload = function() {
-                    console.log("✅ 从备用CDN加载成功");
-                    if (typeof window.katex !== 'undefined') {
-                        loadAutoRenderBackup();
-                    }
-                };
-                backupScript.onerror = function() {
-                    console.error("❌ 备用CDN也失败");
-                };
-                document.head.appendChild(backupScript);
-            }
-            
-            function loadAutoRenderBackup() {
-                var backupAutoRender = document.createElement('script');
-                backupAutoRender.src = 'https://cdnjs.cloudflare.com/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js';
-                backupAutoRender.onload = function() {
-                    if (typeof renderMathInElement !== 'undefined') {
-                        initKaTeXRendering();
-                    }
-                };
-                document.head.appendChild(backupAutoRender);
-            }
-        })();
-        </script>
-        <script>
-        /* ========== 关键函数：初始化KaTeX渲染 ========== */
-        function initKaTeXRendering() {
-            console.log("🚀 初始化KaTeX渲染系统");
-            
-            // 严格检查所有必需的对象和函数
-            if (typeof window.katex === 'undefined') {
-                console.error("❌ window.katex 未定义，无法初始化");
-                return;
-            }
-            
-            if (typeof window.katex.render === 'undefined') {
-                console.error("❌ window.katex.render 未定义");
-                return;
-            }
-            
+        return _KATEX_HEADER
+
+
+def _build_latex_regex(patterns: list) -> tuple:
+    """
+    将各LaTeX模式合并为一个命名分组交替正则
+    
+    Returns:
+        (合并后的正则, {分组名: (公式所在分组序号, 显示类型)})
+    """
+    parts = []
+    groups = {}
+    group_index = 1
+    for i, (pattern, display_type) in enumerate(patterns):
+        name = f'g{i}'
+        parts.append(f'(?P<{name}>{pattern.pattern})')
+        groups[name] = (group_index + 1, display_type)
+        group_index += 1 + pattern.groups
+    return re.compile('|'.join(parts)), groups
+
+
+_LATEX_RE, _LATEX_GROUPS = _build_latex_regex(RenderEngine.LATEX_PATTERNS)
+
+
+def _minify_static(source: str) -> str:
+    """
+    压缩静态HTML/JS/CSS：去除缩进、空行和整行的 // 注释
+    
+    只按行处理，不改变任何语句本身，对JavaScript的自动分号插入是安全的。
+    """
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+# ========== 静态资源：WYSIWYG编辑控件 ==========
+_WYSIWYG_JS_SOURCE = """
+<script>
+// WYSIWYG Editing Controls
+
+function insertMarkdown(textarea, prefix, suffix) {
+    const start = textarea.selectionStart;
+    const end = textarea.selectionEnd;
+    const selectedText = textarea.value.substring(start, end);
+    const before = textarea.value.substring(0, start);
+    const after = textarea.value.substring(end);
+
+    textarea.value = before + prefix + selectedText + suffix + after;
+
+    // Set cursor position
+    const newPos = start + prefix.length + selectedText.length + suffix.length;
+    textarea.setSelectionRange(newPos, newPos);
+    textarea.focus();
+
+    // Trigger change event
+    textarea.dispatchEvent(new Event('input', { bubbles: true }));
+}
+
+function makeBold(textarea) {
+    insertMarkdown(textarea, '**', '**');
+}
+
+function makeItalic(textarea) {
+    insertMarkdown(textarea, '*', '*');
+}
+
+function makeList(textarea) {
+    const start = textarea.selectionStart;
+    const end = textarea.selectionEnd;
+    const selectedText = textarea.value.substring(start, end);
+    const lines = selectedText.split('\\n');
+    const listText = lines.map(line => '- ' + line).join('\\n');
+
+    const before = textarea.value.substring(0, start);
+    const after = textarea.value.substring(end);
+
+    textarea.value = before + listText + after;
+    textarea.focus();
+    textarea.dispatchEvent(new Event('input', { bubbles: true }));
+}
+
+// Keyboard shortcuts
+document.addEventListener('keydown', function(e) {
+    const target = e.target;
+    if (target.tagName !== 'TEXTAREA') return;
+
+    // Ctrl+B for bold
+    if (e.ctrlKey && e.key === 'b') {
+        e.preventDefault();
+        makeBold(target);
+    }
+
+    // Ctrl+I for italic
+    if (e.ctrlKey && e.key === 'i') {
+        e.preventDefault();
+        makeItalic(target);
+    }
+
+    // Ctrl+L for list
+    if (e.ctrlKey && e.key === 'l') {
+        e.preventDefault();
+        makeList(target);
+    }
+});
+</script>
+"""
+
+# ========== 静态资源：KaTeX CSS/JS及自动渲染配置 ==========
+# 手动控制加载顺序，避免竞态条件：先加载CSS，然后按顺序加载JS
+_KATEX_HEADER_SOURCE = '''
+<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
+<script>
+// 手动顺序加载 KaTeX 库
+(function() {
+    console.log("🔧 开始加载 KaTeX 库...");
+
+    // 第一步：加载 KaTeX 核心
+    var katexScript = document.createElement('script');
+    katexScript.src = 'https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js';
+    katexScript.onload = function() {
+        console.log("✅ KaTeX 核心加载成功");
+        console.log("   window.katex:", typeof window.katex);
+        console.log("   katex.render:", typeof window.katex.render);
+
+        // 验证 KaTeX 对象已正确初始化
+        if (typeof window.katex === 'undefined') {
+            console.error("❌ window.katex 未定义");
+            tryBackupCDN();
+            return;
+        }
+
+        // 第二步：加载 auto-render
+        loadAutoRender();
+    };
+    katexScript.onerror = function() {
+        console.error("❌ KaTeX 核心加载失败，尝试备用CDN");
+        tryBackupCDN();
+    };
+    document.head.appendChild(katexScript);
+
+    function loadAutoRender() {
+        console.log("🔧 开始加载 auto-render...");
+        var autoRenderScript = document.createElement('script');
+        autoRenderScript.src = 'https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js';
+        autoRenderScript.onload = function() {
+            console.log("✅ auto-render 加载成功");
+            console.log("   renderMathInElement:", typeof renderMathInElement);
+
+            // 验证函数已定义
             if (typeof renderMathInElement === 'undefined') {
                 console.error("❌ renderMathInElement 未定义");
                 return;
             }
-            
-            // 检查是否已初始化
-            if (window.katexRenderingInitialized) {
-                console.log("⚠️ KaTeX渲染已初始化，跳过");
-                return;
-            }
-            
-            window.katexRenderingInitialized = true;
-            console.log("✅ 所有检查通过，开始渲染LaTeX");
-            
-            // 延迟渲染，确保DOM已准备好
-            setTimeout(renderAllMathSafe, 300);
-            setTimeout(renderAllMathSafe, 800);
-            setTimeout(renderAllMathSafe, 1500);
-            setTimeout(renderAllMathSafe, 3000);
-            
-            // 定期检查并渲染
-            setInterval(renderAllMathSafe, 3000);
-            
-            // 启动DOM监听
-            startDOMObserver();
-        }
-        
-        /* ========== DOM变化监听 ========== */
-        function startDOMObserver() {
-            if (typeof MutationObserver === 'undefined') {
-                console.warn("⚠️ MutationObserver不可用");
-                return;
+
+            // 第三步：初始化渲染
+            initKaTeXRendering();
+        };
+        autoRenderScript.onerror = function() {
+            console.error("❌ auto-render 加载失败");
+        };
+        document.head.appendChild(autoRenderScript);
+    }
+
+    function tryBackupCDN() {
+        console.log("🔄 尝试备用 CDN (cdnjs)...");
+        var backupScript = document.createElement('script');
+        backupScript.src = 'https://cdnjs.cloudflare.com/ajax/libs/KaTeX/0.16.9/katex.min.js';
+        backupScript.onload = function() {
+            console.log("✅ 从备用CDN加载成功");
+            if (typeof window.katex !== 'undefined') {
+                loadAutoRenderBackup();
             }
-            
-            if (window.katexObserverStarted) {
-                return; // 避免重复启动
+        };
+        backupScript.onerror = function() {
+            console.error("❌ 备用CDN也失败");
+        };
+        document.head.appendChild(backupScript);
+    }
+
+    function loadAutoRenderBackup() {
+        var backupAutoRender = document.createElement('script');
+        backupAutoRender.src = 'https://cdnjs.cloudflare.com/ajax/libs/KaTeX/0.16.9/contrib/auto-render.min.js';
+        backupAutoRender.onload = function() {
+            if (typeof renderMathInElement !== 'undefined') {
+                initKaTeXRendering();
             }
-            
-            window.katexObserverStarted = true;
-            
-            var debounceTimer;
-            const observer = new MutationObserver(function(mutations) {
-                // 防抖：避免过于频繁触发
-                clearTimeout(debounceTimer);
-                debounceTimer = setTimeout(renderAllMathSafe, 200);
+        };
+        document.head.appendChild(backupAutoRender);
+    }
+})();
+</script>
+<script>
+/* ========== 关键函数：初始化KaTeX渲染 ========== */
+function initKaTeXRendering() {
+    console.log("🚀 初始化KaTeX渲染系统");
+
+    // 严格检查所有必需的对象和函数
+    if (typeof window.katex === 'undefined') {
+        console.error("❌ window.katex 未定义，无法初始化");
+        return;
+    }
+
+    if (typeof window.katex.render === 'undefined') {
+        console.error("❌ window.katex.render 未定义");
+        return;
+    }
+
+    if (typeof renderMathInElement === 'undefined') {
+        console.error("❌ renderMathInElement 未定义");
+        return;
+    }
+
+    // 检查是否已初始化
+    if (window.katexRenderingInitialized) {
+        console.log("⚠️ KaTeX渲染已初始化，跳过");
+        return;
+    }
+
+    window.katexRenderingInitialized = true;
+    console.log("✅ 所有检查通过，开始渲染LaTeX");
+
+    // 延迟渲染，确保DOM已准备好
+    setTimeout(renderAllMathSafe, 300);
+    setTimeout(renderAllMathSafe, 800);
+    setTimeout(renderAllMathSafe, 1500);
+    setTimeout(renderAllMathSafe, 3000);
+
+    // 定期检查并渲染
+    setInterval(renderAllMathSafe, 3000);
+
+    // 启动DOM监听
+    startDOMObserver();
+}
+
+/* ========== DOM变化监听 ========== */
+function startDOMObserver() {
+    if (typeof MutationObserver === 'undefined') {
+        console.warn("⚠️ MutationObserver不可用");
+        return;
+    }
+
+    if (window.katexObserverStarted) {
+        return; // 避免重复启动
+    }
+
+    window.katexObserverStarted = true;
+
+    var debounceTimer;
+    const observer = new MutationObserver(function(mutations) {
+        // 防抖：避免过于频繁触发
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(renderAllMathSafe, 200);
+    });
+
+    // 延迟启动observer确保body存在
+    setTimeout(function() {
+        if (document.body) {
+            observer.observe(document.body, {
+                childList: true,
+                subtree: true,
+                attributes: true,
+                attributeFilter: ['data-katex-render']
             });
-            
-            // 延迟启动observer确保body存在
-            setTimeout(function() {
-                if (document.body) {
-                    observer.observe(document.body, {
-                        childList: true,
-                        subtree: true,
-                        attributes: true,
-                        attributeFilter: ['data-katex-render']
-                    });
-                    console.log("👁️ DOM监听已启动");
-                }
-            }, 1000);
+            console.log("👁️ DOM监听已启动");
         }
-        
-        /* ========== 安全的渲染函数（带完整错误检查） ========== */
-        function renderAllMathSafe() {
-            // 每次调用前都验证
-            if (typeof window.katex === 'undefined') {
-                return; // 静默失败
-            }
-            
-            if (typeof renderMathInElement === 'undefined') {
-                return; // 静默失败
-            }
-            
-            try {
+    }, 1000);
+}
+
+/* ========== 安全的渲染函数（带完整错误检查） ========== */
+function renderAllMathSafe() {
+    // 每次调用前都验证
+    if (typeof window.katex === 'undefined') {
+        return; // 静默失败
+    }
+
+    if (typeof renderMathInElement === 'undefined') {
+        return; // 静默失败
+    }
+
+    try {
+        renderAllMath();
+    } catch (e) {
+        console.error("❌ 渲染过程出错:", e);
+    }
+}
+
+/* ========== 多种加载事件监听 ========== */
+if (document.readyState === 'loading') {
+    document.addEventListener("DOMContentLoaded", function() {
+        console.log("� DOMContentLoaded triggered");
+        setTimeout(function() {
+            if (window.autoRenderLoaded) {
                 renderAllMath();
-            } catch (e) {
-                console.error("❌ 渲染过程出错:", e);
             }
+        }, 100);
+    });
+} else {
+    console.log("📄 Document already loaded");
+}
+
+window.addEventListener('load', function() {
+    console.log("🌐 Window loaded");
+    setTimeout(function() {
+        if (window.autoRenderLoaded) {
+            renderAllMath();
         }
-        
-        /* ========== 多种加载事件监听 ========== */
-        if (document.readyState === 'loading') {
-            document.addEventListener("DOMContentLoaded", function() {
-                console.log("� DOMContentLoaded triggered");
-                setTimeout(function() {
-                    if (window.autoRenderLoaded) {
-                        renderAllMath();
-                    }
-                }, 100);
-            });
-        } else {
-            console.log("📄 Document already loaded");
+    }, 100);
+});
+
+/* ========== 关键函数：渲染所有LaTeX公式 ========== */
+/* ⚠️ 重要配置说明：
+ * 1. 查找所有data-katex-render="true"的元素
+ * 2. 使用KaTeX auto-render渲染其中的$...$和$$...$$
+ * 3. 渲染完成后标记为data-katex-render="done"避免重复
+ * 4. 不要修改delimiters配置（$和$$是标准LaTeX语法）
+ */
+function renderAllMath() {
+    if (typeof renderMathInElement === 'undefined') {
+        return; // 静默失败，避免刷屏
+    }
+
+    try {
+        // 查找所有标记为需要渲染的容器
+        const targets = document.querySelectorAll('[data-katex-render="true"]');
+
+        if (targets.length === 0) {
+            return; // 没有目标就不输出日志
         }
-        
-        window.addEventListener('load', function() {
-            console.log("🌐 Window loaded");
-            setTimeout(function() {
-                if (window.autoRenderLoaded) {
-                    renderAllMath();
-                }
-            }, 100);
-        });
-        
-        /* ========== 关键函数：渲染所有LaTeX公式 ========== */
-        /* ⚠️ 重要配置说明：
-         * 1. 查找所有data-katex-render="true"的元素
-         * 2. 使用KaTeX auto-render渲染其中的$...$和$$...$$
-         * 3. 渲染完成后标记为data-katex-render="done"避免重复
-         * 4. 不要修改delimiters配置（$和$$是标准LaTeX语法）
-         */
-        function renderAllMath() {
-            if (typeof renderMathInElement === 'undefined') {
-                return; // 静默失败，避免刷屏
+
+        let renderedCount = 0;
+        console.log("🔍 找到 " + targets.length + " 个待渲染容器");
+
+        targets.forEach(function(elem) {
+            if (!elem || !elem.textContent) {
+                return; // 跳过空元素
             }
-            
-            try {
-                // 查找所有标记为需要渲染的容器
-                const targets = document.querySelectorAll('[data-katex-render="true"]');
-                
-                if (targets.length === 0) {
-                    return; // 没有目标就不输出日志
-                }
-                
-                let renderedCount = 0;
-                console.log("🔍 找到 " + targets.length + " 个待渲染容器");
-                
-                targets.forEach(function(elem) {
-                    if (!elem || !elem.textContent) {
-                        return; // 跳过空元素
-                    }
-                    
-                    const hasLaTeX = elem.textContent.includes('$');
-                    const alreadyRendered = elem.querySelector('.katex') !== null;
-                    
-                    console.log("  📋 容器状态: LaTeX=" + hasLaTeX + ", 已渲染=" + alreadyRendered);
-                    
-                    if (hasLaTeX && !alreadyRendered) {
-                        console.log("  ▶️ 开始渲染:", elem.textContent.substring(0, 50) + "...");
-                        
-                        try {
-                            renderMathInElement(elem, {
-                                delimiters: [
-                                    {left: '$$', right: '$$', display: true},
-                                    {left: '$', right: '$', display: false}
-                                ],
-                                throwOnError: false,
-                                errorColor: '#cc0000',
-                                strict: false,
-                                trust: true
-                            });
-                            
-                            // 检查渲染结果
-                            const katexCount = elem.querySelectorAll('.katex').length;
-                            console.log("  ✅ 渲染完成，生成 " + katexCount + " 个.katex元素");
-                            
-                            // 标记已渲染
-                            elem.setAttribute('data-katex-render', 'done');
-                            renderedCount++;
-                        } catch (renderError) {
-                            console.error("  ❌ 渲染失败:", renderError);
-                        }
-                    }
-                });
-                
-                if (renderedCount > 0) {
-                    console.log("✨ 本次成功渲染 " + renderedCount + " 个容器");
+
+            const hasLaTeX = elem.textContent.includes('$');
+            const alreadyRendered = elem.querySelector('.katex') !== null;
+
+            console.log("  📋 容器状态: LaTeX=" + hasLaTeX + ", 已渲染=" + alreadyRendered);
+
+            if (hasLaTeX && !alreadyRendered) {
+                console.log("  ▶️ 开始渲染:", elem.textContent.substring(0, 50) + "...");
+
+                try {
+                    renderMathInElement(elem, {
+                        delimiters: [
+                            {left: '$$', right: '$$', display: true},
+                            {left: '$', right: '$', display: false}
+                        ],
+                        throwOnError: false,
+                        errorColor: '#cc0000',
+                        strict: false,
+                        trust: true
+                    });
+
+                    // 检查渲染结果
+                    const katexCount = elem.querySelectorAll('.katex').length;
+                    console.log("  ✅ 渲染完成，生成 " + katexCount + " 个.katex元素");
+
+                    // 标记已渲染
+                    elem.setAttribute('data-katex-render', 'done');
+                    renderedCount++;
+                } catch (renderError) {
+                    console.error("  ❌ 渲染失败:", renderError);
                 }
-            } catch (e) {
-                console.error('❌ renderAllMath错误:', e);
             }
+        });
+
+        if (renderedCount > 0) {
+            console.log("✨ 本次成功渲染 " + renderedCount + " 个容器");
         }
-        
-        function checkRenderFailures() {
-            // 查找所有带有 data-fallback 的元素
-            document.querySelectorAll('[data-fallback]').forEach(function(el) {
-                // 检查是否包含 KaTeX 错误或未渲染
-                var hasError = el.querySelector('.katex-error');
-                var hasKatex = el.querySelector('.katex');
-                var text = el.textContent || el.innerText;
-                
-                // 如果有错误，或者没有成功渲染（仍然包含$符号），显示原文
-                if (hasError || (!hasKatex && (text.includes('$') || text.includes('\\\\')))) {
-                    var fallback = el.getAttribute('data-fallback');
-                    if (fallback) {
-                        // 解码HTML实体
-                        var decoded = fallback.replace(/&lt;/g, '<').replace(/&gt;/g, '>').replace(/&amp;/g, '&').replace(/&quot;/g, '"');
-                        el.innerHTML = '<code style="background: #f5f5f5; padding: 2px 6px; border-radius: 3px; font-family: monospace;">' + decoded + '</code>';
-                        el.removeAttribute('data-fallback');
-                    }
-                }
-            });
-        }
-        
-        // 样本点击跳转处理函数
-        window.handleSampleClick = function(sampleIndex) {
-            console.log('Clicking sample:', sampleIndex);
-            // 查找所有number类型输入框
-            var allInputs = document.querySelectorAll('input[type="number"]');
-            console.log('Total number inputs found:', allInputs.length);
-            
-            var targetInput = null;
-            
-            // 方法1: 查找值为-1的输入框（sample_click_index的初始值）
-            for (var i = 0; i < allInputs.length; i++) {
-                var inp = allInputs[i];
-                console.log('Checking input', i, '- value:', inp.value, 'min:', inp.min, 'aria-label:', inp.getAttribute('aria-label'));
-                
-                // 查找最小值为-1的输入框（这是我们特意设置的）
-                if (inp.min === '-1') {
-                    targetInput = inp;
-                    console.log('Found target input by min=-1');
-                    break;
-                }
-            }
-            
-            if (targetInput) {
-                console.log('Setting value to:', sampleIndex);
-                targetInput.value = sampleIndex;
-                targetInput.dispatchEvent(new Event('input', { bubbles: true }));
-                targetInput.dispatchEvent(new Event('change', { bubbles: true }));
-                targetInput.dispatchEvent(new Event('blur', { bubbles: true }));
-                console.log('Events dispatched');
-            } else {
-                console.error('Target input with min=-1 not found!');
+    } catch (e) {
+        console.error('❌ renderAllMath错误:', e);
+    }
+}
+
+function checkRenderFailures() {
+    // 查找所有带有 data-fallback 的元素
+    document.querySelectorAll('[data-fallback]').forEach(function(el) {
+        // 检查是否包含 KaTeX 错误或未渲染
+        var hasError = el.querySelector('.katex-error');
+        var hasKatex = el.querySelector('.katex');
+        var text = el.textContent || el.innerText;
+
+        // 如果有错误，或者没有成功渲染（仍然包含$符号），显示原文
+        if (hasError || (!hasKatex && (text.includes('$') || text.includes('\\\\')))) {
+            var fallback = el.getAttribute('data-fallback');
+            if (fallback) {
+                // 解码HTML实体
+                var decoded = fallback.replace(/&lt;/g, '<').replace(/&gt;/g, '>').replace(/&amp;/g, '&').replace(/&quot;/g, '"');
+                el.innerHTML = '<code style="background: #f5f5f5; padding: 2px 6px; border-radius: 3px; font-family: monospace;">' + decoded + '</code>';
+                el.removeAttribute('data-fallback');
             }
-        };
-        </script>
-        <style>
-        /* LaTeX 公式样式 */
-        .latex-display {
-            display: block;
-            text-align: center;
-            margin: 15px 0;
-            font-size: 18px;
-        }
-        .latex-inline {
-            display: inline;
-            font-size: 18px;
-        }
-        .katex {
-            font-size: 1.1em !important;
         }
-        .katex-display {
-            margin: 15px 0 !important;
-        }
-        /* 渲染失败时的样式 */
-        .katex-error {
-            color: inherit !important;
-            background: #f5f5f5;
-            padding: 2px 6px;
-            border-radius: 3px;
+    });
+}
+
+// 样本点击跳转处理函数
+window.handleSampleClick = function(sampleIndex) {
+    console.log('Clicking sample:', sampleIndex);
+    // 查找所有number类型输入框
+    var allInputs = document.querySelectorAll('input[type="number"]');
+    console.log('Total number inputs found:', allInputs.length);
+
+    var targetInput = null;
+
+    // 方法1: 查找值为-1的输入框（sample_click_index的初始值）
+    for (var i = 0; i < allInputs.length; i++) {
+        var inp = allInputs[i];
+        console.log('Checking input', i, '- value:', inp.value, 'min:', inp.min, 'aria-label:', inp.getAttribute('aria-label'));
+
+        // 查找最小值为-1的输入框（这是我们特意设置的）
+        if (inp.min === '-1') {
+            targetInput = inp;
+            console.log('Found target input by min=-1');
+            break;
         }
-        </style>
-        '''
-        
-        return header
+    }
+
+    if (targetInput) {
+        console.log('Setting value to:', sampleIndex);
+        targetInput.value = sampleIndex;
+        targetInput.dispatchEvent(new Event('input', { bubbles: true }));
+        targetInput.dispatchEvent(new Event('change', { bubbles: true }));
+        targetInput.dispatchEvent(new Event('blur', { bubbles: true }));
+        console.log('Events dispatched');
+    } else {
+        console.error('Target input with min=-1 not found!');
+    }
+};
+</script>
+<style>
+/* LaTeX 公式样式 */
+.latex-display {
+    display: block;
+    text-align: center;
+    margin: 15px 0;
+    font-size: 18px;
+}
+.latex-inline {
+    display: inline;
+    font-size: 18px;
+}
+.katex {
+    font-size: 1.1em !important;
+}
+.katex-display {
+    margin: 15px 0 !important;
+}
+/* 渲染失败时的样式 */
+.katex-error {
+    color: inherit !important;
+    background: #f5f5f5;
+    padding: 2px 6px;
+    border-radius: 3px;
+}
+</style>
+'''
+
+# 导入时压缩一次，之后每次调用直接返回
+_WYSIWYG_JS = _minify_static(_WYSIWYG_JS_SOURCE)
+_KATEX_HEADER = _minify_static(_KATEX_HEADER_SOURCE)
+
+# 每个线程持有自己的RenderEngine（及其Markdown实例），并发渲染无需加锁
+_thread_state = threading.local()
+
+
+def _get_thread_engine() -> RenderEngine:
+    """获取当前线程的RenderEngine实例（线程内首次使用时创建）"""
+    engine = getattr(_thread_state, 'engine', None)
+    if engine is None:
+        engine = RenderEngine()
+        _thread_state.engine = engine
+    return engine
+
+
+@lru_cache(maxsize=2048)
+def _render_block(block: str, with_diff: bool = False) -> str:
+    """
+    渲染单个Markdown块并按文本缓存结果
+    
+    缓存在所有RenderEngine实例之间共享，相同的块只渲染一次。
+    Markdown实例有内部状态，使用当前线程独占的引擎转换。
+    """
+    return _get_thread_engine()._convert_block(block, with_diff)
+
+
+@lru_cache(maxsize=512)
+def _render_markdown_latex_cached(text: str, with_diff: bool) -> str:
+    """按文本缓存 render_markdown_latex / render_markdown_latex_with_diff 的完整输出"""
+    return _get_thread_engine()._render_markdown_latex(text, with_diff)
+
+
+@lru_cache(maxsize=512)
+def _render_diff_tags_cached(text: str) -> str:
+    """按文本缓存 render_diff_tags 的完整输出"""
+    return _get_thread_engine()._render_diff_tags(text)
@@ -0,0 +1,107 @@
+"""
+Shared pytest fixtures.
+
+CSV fixtures are written once per test session; DataManager only reads
+the file, so tests can safely share them. Stateless services are shared
+per test module.
+"""
+
+import csv
+import markdown
+import pytest
+from services import DiffEngine, RenderEngine
+
+
+def write_csv(filename: str, header: list, rows, encoding='utf-8') -> str:
+    """Write a header and rows to a CSV file with the stdlib csv module."""
+    with open(filename, 'w', encoding=encoding, newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+    return filename
+
+
+def single_pass_html(text: str) -> str:
+    """Render text with one full Markdown conversion, wrapped like render_markdown_latex."""
+    engine = RenderEngine()
+    md = markdown.Markdown(extensions=RenderEngine.MARKDOWN_EXTENSIONS)
+    protected, placeholders = engine._protect_latex(text)
+    html = engine._restore_latex(md.convert(protected), placeholders)
+    return RenderEngine._WRAPPER_PREFIX + html + RenderEngine._WRAPPER_SUFFIX
+
+
+def memoize_by_count(build):
+    """Wrap build(num_rows) so each row count is built only once."""
+    cache = {}
+    
+    def make(num_rows: int):
+        if num_rows not in cache:
+            cache[num_rows] = build(num_rows)
+        return cache[num_rows]
+    return make
+
+
+def csv_by_row_count(tmp_path_factory, name: str, row_builder):
+    """
+    Return a function mapping a row count to a CSV in a session temp directory.
+    
+    Row i is row_builder(i); each row count is written once and reused.
+    """
+    directory = tmp_path_factory.mktemp(name)
+    
+    def build(num_rows: int) -> str:
+        rows = (row_builder(i) for i in range(num_rows))
+        return write_csv(str(directory / f"{num_rows}.csv"), ['instruction', 'output', 'chunk'], rows)
+    return memoize_by_count(build)
+
+
+@pytest.fixture(scope="session")
+def csv_factory(tmp_path_factory):
+    """Return a function mapping a row count to a canonical CSV, written once per count."""
+    return csv_by_row_count(
+        tmp_path_factory, "data", lambda i: (f'Question {i}', f'Answer {i}', f'Reference {i}')
+    )
+
+
+@pytest.fixture(scope="session")
+def csv_5(csv_factory):
+    """CSV file with 5 rows."""
+    return csv_factory(5)
+
+
+@pytest.fixture(scope="session")
+def csv_10(csv_factory):
+    """CSV file with 10 rows."""
+    return csv_factory(10)
+
+
+@pytest.fixture(scope="session")
+def csv_20(csv_factory):
+    """CSV file with 20 rows."""
+    return csv_factory(20)
+
+
+@pytest.fixture(scope="session")
+def csv_25(csv_factory):
+    """CSV file with 25 rows."""
+    return csv_factory(25)
+
+
+@pytest.fixture(scope="session")
+def csv_50(csv_factory):
+    """CSV file with 50 rows."""
+    return csv_factory(50)
+
+
+@pytest.fixture(scope="session")
+def gbk_csv(tmp_path_factory):
+    """Two-row CSV with Chinese content encoded as GBK."""
+    csv_path = tmp_path_factory.mktemp("gbk") / "gbk.csv"
+    rows = [('问题1', '答案1', '参考1'), ('问题2', '答案2', '参考2')]
+    return write_csv(str(csv_path), ['instruction', 'output', 'chunk'], rows, encoding='gbk')
+
+
+@pytest.fixture(scope="module")
+def diff_engine():
+    """DiffEngine shared by the tests of one module (it holds no state)."""
+    return DiffEngine()
@@ -4,305 +4,209 @@ Unit tests for DataManager.
 Tests specific examples, edge cases, and error conditions.
 """
 
+import csv
 import os
-import tempfile
+import subprocess
+import sys
 import pytest
-import pandas as pd
 from services import DataManager
 
 
-def create_test_csv(num_rows: int, filename: str, encoding='utf-8') -> str:
-    """Helper function to create a test CSV file."""
-    data = {
-        'instruction': [f'Question {i}' for i in range(num_rows)],
-        'output': [f'Answer {i}' for i in range(num_rows)],
-        'chunk': [f'Reference {i}' for i in range(num_rows)]
-    }
-    df = pd.DataFrame(data)
-    df.to_csv(filename, index=False, encoding=encoding)
-    return filename
-
-
 class TestDataManagerInitialization:
     """Test DataManager initialization and validation."""
     
-    def test_init_with_valid_csv(self):
+    def test_init_with_valid_csv(self, csv_10):
         """Test initialization with valid CSV file."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_10, batch_size=5)
         
-        try:
-            create_test_csv(10, csv_path)
-            manager = DataManager(csv_path, batch_size=5)
-            
-            assert manager.csv_path == csv_path
-            assert manager.batch_size == 5
-            assert manager.total_rows == 10
-            assert len(manager.samples) == 0
-            assert manager.current_batch == 0
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        assert manager.csv_path == csv_10
+        assert manager.batch_size == 5
+        assert manager.total_rows == 10
+        assert len(manager.samples) == 0
+        assert manager.current_batch == 0
     
     def test_init_with_missing_file(self):
         """Test initialization with non-existent file."""
         with pytest.raises(FileNotFoundError):
             DataManager('/nonexistent/file.csv')
     
-    def test_init_with_missing_columns(self):
+    def test_init_with_missing_columns(self, tmp_path):
         """Test initialization with CSV missing required columns."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        csv_path = str(tmp_path / "missing_columns.csv")
+        
+        # Create CSV with wrong columns
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows([['question', 'answer'], ['Q1', 'A1'], ['Q2', 'A2']])
         
-        try:
-            # Create CSV with wrong columns
-            df = pd.DataFrame({
-                'question': ['Q1', 'Q2'],
-                'answer': ['A1', 'A2']
-            })
-            df.to_csv(csv_path, index=False)
-            
-            with pytest.raises(ValueError, match="缺少必需的列"):
-                DataManager(csv_path)
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        with pytest.raises(ValueError, match="缺少必需的列"):
+            DataManager(csv_path)
     
-    def test_init_with_gbk_encoding(self):
+    def test_row_count_handles_multiline_and_empty_rows(self, tmp_path):
+        """Test quoted newlines stay in one row and rows without instruction are skipped."""
+        csv_path = str(tmp_path / "multiline.csv")
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows([
+                ['instruction', 'output', 'chunk'],
+                ['Q1', 'line 1\nline 2\nline 3', 'C1'],
+                ['', 'orphan answer', 'C2'],
+                ['Q3', 'A3', 'C3'],
+            ])
+        
+        manager = DataManager(csv_path)
+        assert manager.total_rows == 2
+    
+    def test_init_with_gbk_encoding(self, gbk_csv):
         """Test initialization with GBK encoded CSV."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(gbk_csv)
+        assert manager.total_rows == 2
+    
+    def test_pandas_imported_lazily(self):
+        """Test importing the services package does not load pandas."""
+        code = "import sys, services; print('pandas' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
         
-        try:
-            # Create GBK encoded CSV
-            data = {
-                'instruction': ['问题1', '问题2'],
-                'output': ['答案1', '答案2'],
-                'chunk': ['参考1', '参考2']
-            }
-            df = pd.DataFrame(data)
-            df.to_csv(csv_path, index=False, encoding='gbk')
-            
-            manager = DataManager(csv_path)
-            assert manager.total_rows == 2
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        assert result.stdout.strip() == "False"
 
 
 class TestBatchLoading:
     """Test batch loading functionality."""
     
-    def test_load_first_batch(self):
+    def test_load_first_batch(self, csv_20):
         """Test loading the first batch."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_20, batch_size=10)
         
-        try:
-            create_test_csv(20, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            
-            samples = manager.load_next_batch()
-            
-            assert len(samples) == 10
-            assert manager.current_batch == 1
-            assert len(manager.samples) == 10
-            assert samples[0].id == '0'
-            assert samples[9].id == '9'
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
-    
-    def test_load_multiple_batches(self):
-        """Test loading multiple batches."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        samples = manager.load_next_batch()
         
-        try:
-            create_test_csv(25, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            
-            # Load first batch
-            batch1 = manager.load_next_batch()
-            assert len(batch1) == 10
-            
-            # Load second batch
-            batch2 = manager.load_next_batch()
-            assert len(batch2) == 10
-            
-            # Load third batch (partial)
-            batch3 = manager.load_next_batch()
-            assert len(batch3) == 5
-            
-            # Total samples
-            assert len(manager.samples) == 25
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        assert len(samples) == 10
+        assert manager.current_batch == 1
+        assert len(manager.samples) == 10
+        # 样本ID从1开始编号
+        assert [s.id for s in samples] == [str(i) for i in range(1, 11)]
     
-    def test_load_when_no_more_data(self):
-        """Test loading when all data is already loaded."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+    @pytest.mark.parametrize("total,batch_size,expected", [
+        (20, 10, [10]),
+        (25, 10, [10, 10, 5]),
+        (10, 10, [10, 0]),
+    ], ids=["first", "partial_last", "exhausted"])
+    def test_batch_lengths(self, csv_factory, total, batch_size, expected):
+        """Test successive batches have the expected sizes."""
+        manager = DataManager(csv_factory(total), batch_size=batch_size)
         
-        try:
-            create_test_csv(10, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            
-            # Load all data
-            manager.load_next_batch()
-            
-            # Try to load more
-            batch2 = manager.load_next_batch()
-            assert len(batch2) == 0
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        lengths = [len(manager.load_next_batch()) for _ in expected]
+        
+        assert lengths == expected
+        assert len(manager.samples) == sum(expected)
 
 
 class TestSampleRetrieval:
     """Test sample retrieval functionality."""
     
-    def test_get_sample_valid_index(self):
+    def test_get_sample_valid_index(self, csv_10):
         """Test getting sample with valid index."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_10, batch_size=10)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(10, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            manager.load_next_batch()
-            
-            sample = manager.get_sample(5)
-            assert sample is not None
-            assert sample.id == '5'
-            assert sample.instruction == 'Question 5'
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        sample = manager.get_sample(5)
+        assert sample is not None
+        # 样本ID从1开始编号，下标5对应ID '6'
+        assert sample.id == '6'
+        assert sample.instruction == 'Question 5'
     
-    def test_get_sample_invalid_index(self):
+    def test_get_sample_invalid_index(self, csv_10):
         """Test getting sample with invalid index."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_10, batch_size=10)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(10, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            manager.load_next_batch()
-            
-            assert manager.get_sample(-1) is None
-            assert manager.get_sample(100) is None
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        assert manager.get_sample(-1) is None
+        assert manager.get_sample(100) is None
 
 
 class TestStatusTracking:
     """Test sample status tracking."""
     
-    def test_update_sample_status(self):
+    def test_update_sample_status(self, csv_5):
         """Test updating sample status."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_5, batch_size=5)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(5, csv_path)
-            manager = DataManager(csv_path, batch_size=5)
-            manager.load_next_batch()
-            
-            # Update status
-            manager.update_sample_status('0', 'corrected')
-            assert manager.samples[0].status == 'corrected'
-            
-            manager.update_sample_status('1', 'discarded')
-            assert manager.samples[1].status == 'discarded'
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        # Update status
+        manager.update_sample_status('1', 'corrected')
+        assert manager.samples[0].status == 'corrected'
+        
+        manager.update_sample_status('2', 'discarded')
+        assert manager.samples[1].status == 'discarded'
     
-    def test_update_invalid_status(self):
+    def test_update_invalid_status(self, csv_5):
         """Test updating with invalid status."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_5, batch_size=5)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(5, csv_path)
-            manager = DataManager(csv_path, batch_size=5)
-            manager.load_next_batch()
-            
-            with pytest.raises(ValueError, match="Invalid status"):
-                manager.update_sample_status('0', 'invalid_status')
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        with pytest.raises(ValueError, match="Invalid status"):
+            manager.update_sample_status('1', 'invalid_status')
     
-    def test_update_nonexistent_sample(self):
+    def test_update_nonexistent_sample(self, csv_5):
         """Test updating status of non-existent sample."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_5, batch_size=5)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(5, csv_path)
-            manager = DataManager(csv_path, batch_size=5)
+        with pytest.raises(ValueError, match="not found"):
+            manager.update_sample_status('999', 'corrected')
+    
+    def test_update_status_across_batches(self, csv_25):
+        """Test samples from every loaded batch can be updated by id."""
+        manager = DataManager(csv_25, batch_size=10)
+        for _ in range(3):
             manager.load_next_batch()
-            
-            with pytest.raises(ValueError, match="not found"):
-                manager.update_sample_status('999', 'corrected')
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        
+        last = manager.samples[-1]
+        manager.update_sample_status(last.id, 'discarded')
+        
+        assert last.status == 'discarded'
+        assert [s.status for s in manager.samples].count('discarded') == 1
 
 
 class TestProgressTracking:
     """Test progress tracking functionality."""
     
-    def test_get_progress(self):
+    def test_get_progress(self, csv_10):
         """Test getting progress information."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_10, batch_size=10)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(10, csv_path)
-            manager = DataManager(csv_path, batch_size=10)
-            manager.load_next_batch()
-            
-            # Initially no processed samples
-            processed, total = manager.get_progress()
-            assert processed == 0
-            assert total == 10
-            
-            # Mark some as corrected
-            manager.update_sample_status('0', 'corrected')
-            manager.update_sample_status('1', 'corrected')
-            manager.update_sample_status('2', 'discarded')
-            
-            processed, total = manager.get_progress()
-            assert processed == 3
-            assert total == 10
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        # Initially no processed samples
+        processed, total = manager.get_progress()
+        assert processed == 0
+        assert total == 10
+        
+        # Mark some as corrected
+        manager.update_sample_status('1', 'corrected')
+        manager.update_sample_status('2', 'corrected')
+        manager.update_sample_status('3', 'discarded')
+        
+        processed, total = manager.get_progress()
+        assert processed == 3
+        assert total == 10
     
-    def test_should_load_next_batch(self):
+    def test_should_load_next_batch(self, csv_50):
         """Test batch loading threshold logic."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-            csv_path = f.name
+        manager = DataManager(csv_50, batch_size=20)
+        manager.load_next_batch()
         
-        try:
-            create_test_csv(50, csv_path)
-            manager = DataManager(csv_path, batch_size=20)
-            manager.load_next_batch()
-            
-            # Initially should not load (0 processed, threshold is 10)
-            assert not manager.should_load_next_batch()
-            
-            # Mark 10 samples as corrected (reaches threshold)
-            for i in range(10):
-                manager.update_sample_status(str(i), 'corrected')
-            
-            # Should trigger loading
-            assert manager.should_load_next_batch()
-        finally:
-            if os.path.exists(csv_path):
-                os.remove(csv_path)
+        # Initially should not load (0 processed, threshold is 20 - 1 = 19)
+        assert not manager.should_load_next_batch()
+        
+        # Mark 10 samples as corrected (IDs start at 1), still below the threshold
+        for i in range(1, 11):
+            manager.update_sample_status(str(i), 'corrected')
+        assert not manager.should_load_next_batch()
+        
+        # Mark 19 samples as corrected (reaches threshold)
+        for i in range(11, 20):
+            manager.update_sample_status(str(i), 'corrected')
+        
+        # Should trigger loading
+        assert manager.should_load_next_batch()
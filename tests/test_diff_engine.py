@@ -8,185 +8,151 @@ import pytest
 from services import DiffEngine
 
 
+@pytest.fixture(scope="module")
+def over_limit_text():
+    """Text one character longer than DiffEngine accepts, built once per module."""
+    return "a" * (DiffEngine.MAX_TEXT_LENGTH + 1)
+
+
+@pytest.fixture(scope="module")
+def checked_diff(diff_engine):
+    """compute_diff that also asserts the result's tags are balanced."""
+    def diff(original, modified):
+        result = diff_engine.compute_diff(original, modified)
+        assert diff_engine.validate_tags(result), result
+        return result
+    return diff
+
+
 class TestDiffEngineBasic:
     """Test basic diff functionality."""
     
-    def test_identical_text(self):
+    def test_identical_text(self, diff_engine):
         """Test diff of identical text."""
-        engine = DiffEngine()
-        result = engine.compute_diff("Hello world", "Hello world")
+        result = diff_engine.compute_diff("Hello world", "Hello world")
         
         assert result == "Hello world"
         assert '<false>' not in result
         assert '<true>' not in result
     
-    def test_simple_deletion(self):
-        """Test simple deletion."""
-        engine = DiffEngine()
-        result = engine.compute_diff("Hello world", "Hello")
-        
-        assert '<false>' in result
-        assert 'world' in result
-    
-    def test_simple_addition(self):
-        """Test simple addition."""
-        engine = DiffEngine()
-        result = engine.compute_diff("Hello", "Hello world")
-        
-        assert '<true>' in result
-        assert 'world' in result
-    
-    def test_replacement(self):
-        """Test text replacement."""
-        engine = DiffEngine()
-        result = engine.compute_diff("Hello world", "Hello universe")
-        
-        assert '<false>' in result
-        assert '<true>' in result
-        assert 'world' in result
-        assert 'universe' in result
+    @pytest.mark.parametrize("original,modified,tags,words", [
+        ("Hello world", "Hello", ["<false>"], ["world"]),
+        ("Hello", "Hello world", ["<true>"], ["world"]),
+        ("Hello world", "Hello universe", ["<false>", "<true>"], ["world", "universe"]),
+    ], ids=["deletion", "addition", "replacement"])
+    def test_simple_edits(self, diff_engine, original, modified, tags, words):
+        """Test simple deletion, addition and replacement."""
+        result = diff_engine.compute_diff(original, modified)
+        
+        for tag in tags:
+            assert tag in result
+        for word in words:
+            assert word in result
 
 
 class TestDiffEngineEdgeCases:
     """Test edge cases."""
     
-    def test_empty_strings(self):
+    def test_empty_strings(self, diff_engine):
         """Test with empty strings."""
-        engine = DiffEngine()
-        
         # Both empty
-        assert engine.compute_diff("", "") == ""
+        assert diff_engine.compute_diff("", "") == ""
         
         # Original empty
-        result = engine.compute_diff("", "Hello")
+        result = diff_engine.compute_diff("", "Hello")
         assert result == "<true>Hello</true>"
         
         # Modified empty
-        result = engine.compute_diff("Hello", "")
+        result = diff_engine.compute_diff("Hello", "")
         assert result == "<false>Hello</false>"
     
-    def test_whitespace_only(self):
+    def test_whitespace_only(self, diff_engine):
         """Test with whitespace."""
-        engine = DiffEngine()
-        result = engine.compute_diff("   ", "   ")
+        result = diff_engine.compute_diff("   ", "   ")
         
         assert result == "   "
     
-    def test_long_text_error(self):
+    def test_long_text_error(self, diff_engine, over_limit_text):
         """Test error handling for very long text."""
-        engine = DiffEngine()
-        long_text = "a" * 100001
-        
         with pytest.raises(ValueError, match="文本过长"):
-            engine.compute_diff(long_text, "short")
+            diff_engine.compute_diff(over_limit_text, "short")
+    
+    def test_text_at_limit_accepted(self, diff_engine):
+        """Test text exactly at the length limit is still diffed."""
+        text = "a" * DiffEngine.MAX_TEXT_LENGTH
+        
+        assert diff_engine.compute_diff(text, text) == text
     
-    def test_markdown_preservation(self):
+    def test_markdown_preservation(self, diff_engine):
         """Test that Markdown syntax is preserved."""
-        engine = DiffEngine()
         original = "This is **bold** text"
         modified = "This is **bold** and *italic* text"
         
-        result = engine.compute_diff(original, modified)
+        result = diff_engine.compute_diff(original, modified)
         
         # Markdown markers should be preserved
         assert '**bold**' in result
         assert '*italic*' in result
     
-    def test_latex_preservation(self):
+    def test_latex_preservation(self, checked_diff):
         """Test that LaTeX syntax is preserved."""
-        engine = DiffEngine()
         original = "The formula is $x^2 + y^2 = z^2$"
         modified = "The formula is $x^2 + y^2 = z^2$ and $E = mc^2$"
         
-        result = engine.compute_diff(original, modified)
+        result = checked_diff(original, modified)
         
         # LaTeX content should be preserved (may have tags around parts)
         assert 'x^2' in result
         assert 'y^2' in result
         assert 'z^2' in result
         assert 'E = mc^2' in result
-        assert engine.validate_tags(result)
 
 
 class TestTagValidation:
     """Test tag validation functionality."""
     
-    def test_validate_balanced_tags(self):
+    def test_validate_balanced_tags(self, diff_engine):
         """Test validation of balanced tags."""
-        engine = DiffEngine()
-        
         # Balanced tags
-        assert engine.validate_tags("<false>deleted</false><true>added</true>")
-        assert engine.validate_tags("no tags here")
-        assert engine.validate_tags("")
+        assert diff_engine.validate_tags("<false>deleted</false><true>added</true>")
+        assert diff_engine.validate_tags("no tags here")
+        assert diff_engine.validate_tags("")
     
-    def test_validate_unbalanced_tags(self):
+    def test_validate_unbalanced_tags(self, diff_engine):
         """Test validation of unbalanced tags."""
-        engine = DiffEngine()
-        
         # Unbalanced tags
-        assert not engine.validate_tags("<false>deleted")
-        assert not engine.validate_tags("<true>added")
-        assert not engine.validate_tags("<false>deleted</false><true>added")
+        assert not diff_engine.validate_tags("<false>deleted")
+        assert not diff_engine.validate_tags("<true>added")
+        assert not diff_engine.validate_tags("<false>deleted</false><true>added")
     
-    def test_auto_fix_tags(self):
+    def test_auto_fix_tags(self, diff_engine):
         """Test automatic tag fixing."""
-        engine = DiffEngine()
-        
         # The _validate_and_fix_tags method should fix unbalanced tags
-        fixed = engine._validate_and_fix_tags("<false>deleted<true>added</true>")
-        assert engine.validate_tags(fixed)
+        fixed = diff_engine._validate_and_fix_tags("<false>deleted<true>added</true>")
+        assert diff_engine.validate_tags(fixed)
 
 
 class TestStripTags:
     """Test tag stripping functionality."""
     
-    def test_strip_false_tags(self):
-        """Test stripping false tags."""
-        engine = DiffEngine()
-        result = engine.strip_tags("<false>deleted</false> text")
-        
-        assert result == "deleted text"
-        assert '<false>' not in result
-    
-    def test_strip_true_tags(self):
-        """Test stripping true tags."""
-        engine = DiffEngine()
-        result = engine.strip_tags("text <true>added</true>")
-        
-        assert result == "text added"
-        assert '<true>' not in result
-    
-    def test_strip_mixed_tags(self):
-        """Test stripping mixed tags."""
-        engine = DiffEngine()
-        result = engine.strip_tags(
-            "<false>old</false> middle <true>new</true>"
-        )
-        
-        assert result == "old middle new"
-        assert '<false>' not in result
-        assert '<true>' not in result
-    
-    def test_strip_nested_content(self):
-        """Test stripping tags with nested content."""
-        engine = DiffEngine()
-        result = engine.strip_tags(
-            "<false>This is **bold** text</false>"
-        )
-        
-        # Markdown should be preserved
-        assert result == "This is **bold** text"
-        assert '**bold**' in result
+    @pytest.mark.parametrize("tagged,expected", [
+        ("<false>deleted</false> text", "deleted text"),
+        ("text <true>added</true>", "text added"),
+        ("<false>old</false> middle <true>new</true>", "old middle new"),
+        # Markdown inside tags should be preserved
+        ("<false>This is **bold** text</false>", "This is **bold** text"),
+    ], ids=["false", "true", "mixed", "nested_markdown"])
+    def test_strip(self, diff_engine, tagged, expected):
+        """Test stripping diff tags keeps the inner content."""
+        assert diff_engine.strip_tags(tagged) == expected
 
 
 class TestWordLevelDiff:
     """Test word-level diff behavior."""
     
-    def test_word_boundary_preservation(self):
+    def test_word_boundary_preservation(self, diff_engine):
         """Test that word boundaries are preserved."""
-        engine = DiffEngine()
-        result = engine.compute_diff(
+        result = diff_engine.compute_diff(
             "The quick brown fox",
             "The fast brown fox"
         )
@@ -194,51 +160,36 @@ class TestWordLevelDiff:
         # Should detect word-level change
         assert 'quick' in result or 'fast' in result
     
-    def test_punctuation_handling(self):
+    def test_punctuation_handling(self, checked_diff):
         """Test handling of punctuation."""
-        engine = DiffEngine()
-        result = engine.compute_diff(
-            "Hello, world!",
-            "Hello world"
-        )
+        result = checked_diff("Hello, world!", "Hello world")
         
         # Punctuation changes should be detected
-        assert engine.validate_tags(result)
+        assert '<false>' in result or '<true>' in result
     
-    def test_multiline_text(self):
+    def test_multiline_text(self, checked_diff):
         """Test handling of multiline text."""
-        engine = DiffEngine()
         original = "Line 1\nLine 2\nLine 3"
         modified = "Line 1\nModified Line 2\nLine 3"
         
-        result = engine.compute_diff(original, modified)
+        result = checked_diff(original, modified)
         
         # Should handle newlines correctly
         assert '\n' in result
-        assert engine.validate_tags(result)
 
 
 class TestChineseText:
     """Test handling of Chinese text."""
     
-    def test_chinese_diff(self):
+    def test_chinese_diff(self, checked_diff):
         """Test diff with Chinese characters."""
-        engine = DiffEngine()
-        result = engine.compute_diff(
-            "这是原始文本",
-            "这是修改后的文本"
-        )
+        result = checked_diff("这是原始文本", "这是修改后的文本")
         
         # Should handle Chinese characters
         assert '原始' in result or '修改后的' in result
-        assert engine.validate_tags(result)
     
-    def test_mixed_language(self):
+    def test_mixed_language(self, checked_diff):
         """Test diff with mixed Chinese and English."""
-        engine = DiffEngine()
-        result = engine.compute_diff(
-            "这是 English 文本",
-            "这是 Modified English 文本"
-        )
+        result = checked_diff("这是 English 文本", "这是 Modified English 文本")
         
-        assert engine.validate_tags(result)
+        assert 'Modified' in result
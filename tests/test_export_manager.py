@@ -11,6 +11,17 @@ from services import ExportManager
 from models import Sample
 
 
+@pytest.fixture
+def sample_factory():
+    """Build n corrected samples with distinct ids and content."""
+    def make(n):
+        return [
+            Sample(id=str(i), instruction=f"Q{i}", output=f"A{i}", chunk=f"C{i}", status="corrected")
+            for i in range(n)
+        ]
+    return make
+
+
 class TestExportManagerInitialization:
     """Test ExportManager initialization."""
     
@@ -34,18 +45,11 @@ class TestExportManagerInitialization:
 class TestSampleAddition:
     """Test adding samples to export queue."""
     
-    def test_add_corrected_sample(self):
+    def test_add_corrected_sample(self, sample_factory):
         """Test adding a corrected sample."""
         manager = ExportManager()
-        sample = Sample(
-            id="0",
-            instruction="Q",
-            output="A",
-            chunk="C",
-            status="corrected"
-        )
         
-        manager.add_sample(sample)
+        manager.add_sample(sample_factory(1)[0])
         assert manager.get_sample_count() == 1
     
     def test_add_non_corrected_sample(self):
@@ -62,21 +66,35 @@ class TestSampleAddition:
         with pytest.raises(ValueError, match="Only corrected samples"):
             manager.add_sample(sample)
     
-    def test_add_multiple_samples(self):
+    def test_add_multiple_samples(self, sample_factory):
         """Test adding multiple samples."""
         manager = ExportManager()
         
-        for i in range(5):
-            sample = Sample(
-                id=str(i),
-                instruction=f"Q{i}",
-                output=f"A{i}",
-                chunk=f"C{i}",
-                status="corrected"
-            )
+        for sample in sample_factory(5):
             manager.add_sample(sample)
         
         assert manager.get_sample_count() == 5
+    
+    def test_add_samples_bulk(self, sample_factory):
+        """Test bulk adding keeps order and replaces duplicate ids."""
+        manager = ExportManager()
+        samples = sample_factory(3)
+        manager.add_sample(samples[1])
+        updated = Sample(id="1", instruction="Q1", output="new", chunk="C1", status="corrected")
+        
+        manager.add_samples(samples + [updated])
+        
+        assert [s.id for s in manager.corrected_samples] == ["1", "0", "2"]
+        assert manager.corrected_samples[0].output == "new"
+    
+    def test_add_samples_rejects_non_corrected(self, sample_factory):
+        """Test bulk adding validates every sample before adding any."""
+        manager = ExportManager()
+        pending = Sample(id="1", instruction="Q", output="A", chunk="C", status="unprocessed")
+        
+        with pytest.raises(ValueError, match="Only corrected samples"):
+            manager.add_samples([sample_factory(1)[0], pending])
+        assert manager.get_sample_count() == 0
 
 
 class TestMessagesFormat:
@@ -173,32 +191,63 @@ class TestQueryResponseFormat:
 class TestFileExport:
     """Test JSON file export."""
     
-    def test_export_to_json(self):
+    @pytest.mark.parametrize("format,key", [
+        ("messages", "messages"),
+        ("alpaca", "instruction"),
+        ("sharegpt", "conversations"),
+        ("query-response", "query"),
+    ])
+    def test_build_export_data(self, sample_factory, format, key):
+        """Test export data is built in memory in queue order."""
+        manager = ExportManager(format=format)
+        manager.add_samples(sample_factory(3))
+        
+        data = manager.build_export_data()
+        
+        assert [item['id'] for item in data] == ["0", "1", "2"]
+        assert all(key in item for item in data)
+    
+    def test_export_to_json(self, sample_factory, tmp_path):
         """Test exporting to JSON file."""
         manager = ExportManager()
-        sample = Sample(
-            id="0",
-            instruction="Q",
-            output="A",
-            chunk="C",
-            status="corrected"
+        manager.add_sample(sample_factory(1)[0])
+        
+        output_file = manager.export_to_json(str(tmp_path / "test"))
+        
+        assert os.path.exists(output_file)
+        assert output_file.endswith('.json')
+        
+        with open(output_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        assert len(data) == 1
+        assert data[0]['id'] == "0"
+    
+    def test_export_file_matches_json_bytes(self, sample_factory, tmp_path):
+        """Test the exported file holds exactly the serialized bytes."""
+        manager = ExportManager()
+        manager.add_sample(sample_factory(1)[0])
+        
+        output_file = manager.export_to_json(str(tmp_path / "test"))
+        
+        with open(output_file, 'rb') as f:
+            assert f.read() == manager.to_json_bytes()
+    
+    def test_json_bytes_match_stdlib_json(self, monkeypatch):
+        """Test orjson and json produce identical bytes for the str/list/dict export data."""
+        import services.export_manager as export_module
+        if export_module.orjson is None:
+            pytest.skip("orjson not installed")
+        manager = ExportManager()
+        manager.add_sample(
+            Sample(id="0", instruction="问题 \"引号\"\n换行", output="答案", chunk="C", status="corrected")
         )
-        manager.add_sample(sample)
         
-        output_file = manager.export_to_json("test")
+        fast = manager.to_json_bytes()
+        monkeypatch.setattr(export_module, "orjson", None)
         
-        try:
-            assert os.path.exists(output_file)
-            assert output_file.endswith('.json')
-            
-            with open(output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            assert len(data) == 1
-            assert data[0]['id'] == "0"
-        finally:
-            if os.path.exists(output_file):
-                os.remove(output_file)
+        assert manager.to_json_bytes() == fast
+        assert json.loads(fast)[0]['messages'][0]['content'] == "问题 \"引号\"\n换行"
     
     def test_export_empty_queue(self):
         """Test exporting with no samples raises error."""
@@ -207,63 +256,35 @@ class TestFileExport:
         with pytest.raises(ValueError, match="没有已校正的样本"):
             manager.export_to_json("test")
     
-    def test_export_filename_format(self):
+    def test_export_filename_format(self, sample_factory, tmp_path):
         """Test exported filename format."""
         manager = ExportManager()
-        sample = Sample(
-            id="0",
-            instruction="Q",
-            output="A",
-            chunk="C",
-            status="corrected"
-        )
-        manager.add_sample(sample)
+        manager.add_sample(sample_factory(1)[0])
         
-        output_file = manager.export_to_json("mydata.csv")
+        output_file = manager.export_to_json(str(tmp_path / "mydata.csv"))
         
-        try:
-            # Should contain base name, timestamp, and count
-            assert 'mydata' in output_file
-            assert '_1.json' in output_file
-        finally:
-            if os.path.exists(output_file):
-                os.remove(output_file)
+        # Should contain base name, timestamp, and count
+        assert 'mydata' in output_file
+        assert '_1.json' in output_file
 
 
 class TestUtilityMethods:
     """Test utility methods."""
     
-    def test_clear(self):
+    def test_clear(self, sample_factory):
         """Test clearing the export queue."""
         manager = ExportManager()
-        
-        for i in range(3):
-            sample = Sample(
-                id=str(i),
-                instruction=f"Q{i}",
-                output=f"A{i}",
-                chunk=f"C{i}",
-                status="corrected"
-            )
-            manager.add_sample(sample)
-        
+        manager.add_samples(sample_factory(3))
         assert manager.get_sample_count() == 3
         
         manager.clear()
         assert manager.get_sample_count() == 0
     
-    def test_get_sample_count(self):
+    def test_get_sample_count(self, sample_factory):
         """Test getting sample count."""
         manager = ExportManager()
         assert manager.get_sample_count() == 0
         
-        sample = Sample(
-            id="0",
-            instruction="Q",
-            output="A",
-            chunk="C",
-            status="corrected"
-        )
-        manager.add_sample(sample)
+        manager.add_sample(sample_factory(1)[0])
         
         assert manager.get_sample_count() == 1
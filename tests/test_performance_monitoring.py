@@ -18,6 +18,35 @@ from utils.performance import (
 from services import DataManager, DiffEngine
 
 
+class FakeClock:
+    """Stand-in for the time module whose clock only moves on tick()."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def time(self):
+        return self.now
+    
+    def tick(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Drive utils.performance timings without sleeping."""
+    fake = FakeClock()
+    monkeypatch.setattr("utils.performance.time", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def _reset_monitor():
+    """Give every test an empty global monitor and leave none behind."""
+    get_monitor().clear()
+    yield
+    get_monitor().clear()
+
+
 def test_performance_monitor_record():
     """Test recording performance metrics."""
     monitor = PerformanceMonitor()
@@ -35,6 +64,21 @@ def test_performance_monitor_record():
     assert stats['total'] == pytest.approx(1.5, rel=0.01)
 
 
+def test_performance_monitor_running_aggregates():
+    """Test stats stay exact over many records without keeping each duration."""
+    monitor = PerformanceMonitor()
+    
+    for i in range(1, 1001):
+        monitor.record("many", i / 1000)
+    
+    stats = monitor.get_stats("many")
+    assert stats['count'] == 1000
+    assert stats['min'] == 0.001
+    assert stats['max'] == 1.0
+    assert stats['avg'] == pytest.approx(0.5005)
+    assert stats['total'] == pytest.approx(500.5)
+
+
 def test_performance_monitor_multiple_operations():
     """Test monitoring multiple operations."""
     monitor = PerformanceMonitor()
@@ -62,10 +106,21 @@ def test_performance_monitor_clear():
     assert monitor.get_stats("test_op")['count'] == 0
 
 
+def test_metrics_property_returns_stats():
+    """Test the legacy metrics attribute is a read-only view of all stats."""
+    monitor = PerformanceMonitor()
+    monitor.record("op", 0.25)
+    monitor.record("op", 0.75)
+    
+    assert monitor.metrics == monitor.get_all_stats()
+    assert monitor.metrics["op"]["count"] == 2
+    with pytest.raises(AttributeError):
+        monitor.metrics = {}
+
+
 def test_monitor_performance_decorator():
-    """Test performance monitoring decorator."""
+    """Test performance monitoring decorator against the real clock."""
     monitor = get_monitor()
-    monitor.clear()
     
     @monitor_performance("test_function")
     def slow_function():
@@ -81,44 +136,44 @@ def test_monitor_performance_decorator():
     assert stats['avg'] >= 0.1
 
 
-def test_measure_time_context_manager():
+def test_measure_time_context_manager(clock):
     """Test time measurement context manager."""
     monitor = get_monitor()
-    monitor.clear()
     
     with measure_time("test_context"):
-        time.sleep(0.1)
+        clock.tick(0.1)
     
     stats = monitor.get_stats("test_context")
     assert stats['count'] == 1
-    assert stats['avg'] >= 0.1
+    assert stats['avg'] == pytest.approx(0.1)
 
 
-def test_check_responsiveness_decorator():
+def test_check_responsiveness_decorator(clock, caplog):
     """Test responsiveness checking decorator."""
     @check_responsiveness(max_duration=0.5)
     def fast_function():
-        time.sleep(0.1)
+        clock.tick(0.1)
         return "done"
     
     @check_responsiveness(max_duration=0.05)
     def slow_function():
-        time.sleep(0.1)
+        clock.tick(0.1)
         return "done"
     
     # Fast function should complete without warning
     result1 = fast_function()
     assert result1 == "done"
+    assert "exceeding limit" not in caplog.text
     
     # Slow function should log warning but still complete
     result2 = slow_function()
     assert result2 == "done"
+    assert "'slow_function' took 0.10s, exceeding limit of 0.05s" in caplog.text
 
 
 def test_data_manager_performance_monitoring():
     """Test that DataManager operations are monitored."""
     monitor = get_monitor()
-    monitor.clear()
     
     # Create test CSV
     with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8') as f:
@@ -144,7 +199,6 @@ def test_data_manager_performance_monitoring():
 def test_diff_engine_performance_monitoring():
     """Test that DiffEngine operations are monitored."""
     monitor = get_monitor()
-    monitor.clear()
     
     engine = DiffEngine()
     
@@ -159,14 +213,13 @@ def test_diff_engine_performance_monitoring():
     assert stats['avg'] > 0
 
 
-def test_performance_stats_for_multiple_calls():
+def test_performance_stats_for_multiple_calls(clock):
     """Test statistics after multiple function calls."""
     monitor = get_monitor()
-    monitor.clear()
     
     @monitor_performance("repeated_op")
     def test_function(duration):
-        time.sleep(duration)
+        clock.tick(duration)
     
     # Call function multiple times with different durations
     test_function(0.05)
@@ -176,9 +229,9 @@ def test_performance_stats_for_multiple_calls():
     stats = monitor.get_stats("repeated_op")
     
     assert stats['count'] == 3
-    assert stats['min'] >= 0.05
-    assert stats['max'] >= 0.15
-    assert 0.05 <= stats['avg'] <= 0.15
+    assert stats['min'] == pytest.approx(0.05)
+    assert stats['max'] == pytest.approx(0.15)
+    assert stats['avg'] == pytest.approx(0.1)
 
 
 def test_performance_monitor_empty_operation():
@@ -202,14 +255,13 @@ def test_global_monitor_instance():
     assert monitor1 is monitor2
 
 
-def test_performance_monitoring_with_exceptions():
+def test_performance_monitoring_with_exceptions(clock):
     """Test that performance is recorded even when function raises exception."""
     monitor = get_monitor()
-    monitor.clear()
     
     @monitor_performance("failing_op")
     def failing_function():
-        time.sleep(0.1)
+        clock.tick(0.1)
         raise ValueError("Test error")
     
     with pytest.raises(ValueError):
@@ -218,7 +270,7 @@ def test_performance_monitoring_with_exceptions():
     # Performance should still be recorded
     stats = monitor.get_stats("failing_op")
     assert stats['count'] == 1
-    assert stats['avg'] >= 0.1
+    assert stats['avg'] == pytest.approx(0.1)
 
 
 def test_performance_log_stats(caplog):
@@ -237,17 +289,16 @@ def test_performance_log_stats(caplog):
     assert "Count: 2" in caplog.text
 
 
-def test_measure_time_with_exception():
+def test_measure_time_with_exception(clock):
     """Test that time is measured even when exception occurs."""
     monitor = get_monitor()
-    monitor.clear()
     
     with pytest.raises(ValueError):
         with measure_time("error_context"):
-            time.sleep(0.1)
+            clock.tick(0.1)
             raise ValueError("Test error")
     
     # Time should still be recorded
     stats = monitor.get_stats("error_context")
     assert stats['count'] == 1
-    assert stats['avg'] >= 0.1
+    assert stats['avg'] == pytest.approx(0.1)
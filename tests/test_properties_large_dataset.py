@@ -107,8 +107,8 @@ def test_property_batch_loading_completeness(total_rows, batch_size):
         ids = [sample.id for sample in all_samples]
         assert len(ids) == len(set(ids))
         
-        # Property 3: IDs are sequential from 0 to total_rows-1
-        expected_ids = set(str(i) for i in range(total_rows))
+        # Property 3: IDs are sequential from 1 to total_rows
+        expected_ids = set(str(i) for i in range(1, total_rows + 1))
         assert set(ids) == expected_ids
         
     finally:
@@ -186,12 +186,12 @@ def test_property_random_batch_access(total_rows, batch_size, jump_to_batch):
             assert len(batch) > 0
             
             # Property 2: Correct samples loaded
-            expected_start_id = target_batch * batch_size
-            assert batch[0].id == str(expected_start_id)
+            start_row = target_batch * batch_size
+            assert batch[0].id == str(start_row + 1)  # IDs start at 1
             
             # Property 3: Only target batch loaded, not all previous batches
             # (samples list should only contain the target batch)
-            expected_samples_count = min(batch_size, total_rows - expected_start_id)
+            expected_samples_count = min(batch_size, total_rows - start_row)
             assert len(dm.samples) == expected_samples_count
         
     finally:
@@ -4,8 +4,11 @@ Property-based tests for RenderEngine.
 Tests universal properties for Markdown/LaTeX rendering and storage.
 """
 
+import re
 from hypothesis import given, strategies as st, settings
 from services import RenderEngine
+from services.render_engine import _FALSE_SPAN_OPEN, _SPAN_CLOSE, _TRUE_SPAN_OPEN, _style_diff_tags
+from tests.conftest import single_pass_html
 
 
 # Feature: llm-qa-correction-workbench, Property 8: Markdown storage format
@@ -83,3 +86,64 @@ def test_nested_rendering_preservation(content, tag_type):
     
     # Property: Content should be preserved
     assert content in result or content.replace('&', '&amp;') in result
+
+
+# 行内容取自会跨空行延续的Markdown结构，空行数量随机
+_BLOCK_LINES = st.sampled_from([
+    "- a", "* b", "1. one", "2. two", "  - sub", "    code", "  continued", "plain **bold**",
+    "# h", "> q", "```", "````", "~~~", "a:b ```", "$$", "x = 1", "\\[", "\\]", "| a | b |", "|---|---|", "\t",
+])
+_BLANK_RUNS = st.integers(min_value=0, max_value=3).map(lambda n: "\n" * n)
+
+
+@given(st.lists(st.tuples(_BLOCK_LINES, _BLANK_RUNS), min_size=1, max_size=12))
+@settings(max_examples=300, deadline=None)
+def test_block_rendering_matches_single_pass(lines):
+    """
+    For any text built from list, code, quote, fence and math lines separated
+    by runs of blank lines, block-by-block rendering should produce exactly
+    the HTML of one full Markdown conversion.
+    """
+    text = "\n".join(line + blanks for line, blanks in lines)
+    
+    assert RenderEngine()._render_markdown_latex(text) == single_pass_html(text)
+
+
+@given(st.lists(st.lists(st.tuples(_BLOCK_LINES, _BLANK_RUNS), min_size=1, max_size=8), min_size=2, max_size=4))
+@settings(max_examples=100, deadline=None)
+def test_block_cache_matches_single_pass(documents):
+    """
+    For any sequence of texts rendered one after another, blocks served from
+    the shared block cache should never change the output compared with an
+    uncached single conversion of each text.
+    """
+    engine = RenderEngine()
+    for lines in documents:
+        text = "\n".join(line + blanks for line, blanks in lines)
+        
+        assert engine._render_markdown_latex(text) == single_pass_html(text)
+
+
+# 原先的正则实现，作为差异标签配对方式的参照
+_DIFF_TAG_RE = re.compile(r'<false>(.*?)</false>|<true>(.*?)</true>', re.DOTALL)
+
+
+def _regex_style_diff_tags(text):
+    def style(match):
+        false_body, true_body = match.groups()
+        if false_body is not None:
+            return _FALSE_SPAN_OPEN + _DIFF_TAG_RE.sub(style, false_body) + _SPAN_CLOSE
+        return _TRUE_SPAN_OPEN + _DIFF_TAG_RE.sub(style, true_body) + _SPAN_CLOSE
+    return _DIFF_TAG_RE.sub(style, text)
+
+
+@given(st.lists(st.sampled_from(["<false>", "</false>", "<true>", "</true>", "a", " ", "\n"]), max_size=20))
+@settings(max_examples=300, deadline=None)
+def test_diff_tag_pairing_matches_regex(pieces):
+    """
+    For any mix of balanced, unbalanced and crossed <false>/<true> tags, the
+    find-based styling should pair tags exactly as the original regex did.
+    """
+    text = "".join(pieces)
+    
+    assert _style_diff_tags(text) == _regex_style_diff_tags(text)
@@ -4,13 +4,16 @@ Property-based tests for UI components.
 Tests universal properties for UI interactions.
 """
 
+import re
 from hypothesis import given, strategies as st, settings
 from ui.event_handlers import (
     toggle_left_column,
     navigate_previous,
     navigate_next,
-    update_progress_display
+    update_progress_display,
+    generate_stats_html
 )
+from models import Sample
 
 
 # Feature: llm-qa-correction-workbench, Property 6: Column visibility toggle
@@ -259,3 +262,27 @@ def test_accordion_toggle(current_open):
         assert new_open == False, "Should close when was open"
     else:
         assert new_open == True, "Should open when was closed"
+
+
+# Feature: llm-qa-correction-workbench, Property 49: Status statistics
+@given(st.lists(st.sampled_from(["unprocessed", "corrected", "discarded"]), max_size=30))
+@settings(max_examples=50)
+def test_stats_counts_match_statuses(statuses):
+    """
+    For any list of samples, the statistics bar should report exactly the
+    number of pending, corrected and discarded samples.
+    """
+    samples = [
+        Sample(id=str(i), instruction="Q", output="A", chunk="C", status=status)
+        for i, status in enumerate(statuses)
+    ]
+    
+    html = generate_stats_html(samples)
+    counts = [int(n) for n in re.findall(r'<span style="color: #[0-9A-F]+;">(\d+)</span>', html)]
+    
+    # Property: Counts appear in pending/corrected/discarded order
+    assert counts == [
+        statuses.count("unprocessed"),
+        statuses.count("corrected"),
+        statuses.count("discarded"),
+    ]
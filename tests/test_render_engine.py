@@ -4,8 +4,28 @@ Unit tests for RenderEngine.
 Tests specific examples for Markdown/LaTeX rendering and diff tag styling.
 """
 
+import os
+import re
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import markdown
 import pytest
 from services import RenderEngine
+from services.render_engine import (
+    _FALSE_SPAN_OPEN,
+    _PLACEHOLDER_PREFIX,
+    _PLACEHOLDER_SUFFIX,
+    _SPAN_CLOSE,
+    _TRUE_SPAN_OPEN,
+    _get_thread_engine,
+    _render_block,
+    _render_diff_tags_cached,
+    _render_markdown_latex_cached,
+    _style_diff_tags,
+)
+from tests.conftest import single_pass_html
 
 
 class TestMarkdownRendering:
@@ -34,13 +54,35 @@ class TestMarkdownRendering:
         
         assert '<li>' in result or '-' in result
     
+    def test_table_and_fenced_code_rendering(self):
+        """Test tables and fenced code blocks are still rendered."""
+        engine = RenderEngine()
+        result = engine.render_markdown_latex("| a | b |\n|---|---|\n| 1 | 2 |\n\n```\ncode\n```")
+        
+        assert '<table>' in result
+        assert '<pre><code>' in result
+    
     def test_empty_text(self):
         """Test rendering empty text."""
         engine = RenderEngine()
         result = engine.render_markdown_latex("")
-        
+
         assert result == ""
 
+    def test_render_failure_escapes_text(self, monkeypatch):
+        """Test fallback output is HTML-escaped when rendering fails."""
+        def broken_render(block, with_diff=False):
+            raise RuntimeError("render failed")
+
+        monkeypatch.setattr("services.render_engine._render_block", broken_render)
+        engine = RenderEngine()
+        # Bypass the output cache so the fallback result is not memoized
+        result = engine._render_markdown_latex("<b>\"A\" & 'B'</b>")
+
+        assert '<pre' in result
+        assert '&lt;b&gt;&quot;A&quot; &amp; &#x27;B&#x27;&lt;/b&gt;' in result
+        assert result.startswith('<div') and result.endswith('</pre></div>')
+
 
 class TestLatexRendering:
     """Test LaTeX formula rendering."""
@@ -69,6 +111,36 @@ class TestLatexRendering:
         
         # Should return output with 'and'
         assert 'and' in result
+
+    def test_all_placeholders_restored(self):
+        """Test every formula is restored in place in a single pass."""
+        engine = RenderEngine()
+        result = engine.render_markdown_latex("Values $a$, $b$ then $$c$$ and \\(d\\)")
+
+        assert _PLACEHOLDER_PREFIX not in result
+        assert 'Values $a$, $b$ then $$c$$ and $d$' in result
+    
+    def test_formula_at_line_start_stays_in_paragraph(self):
+        """Test a leading formula is not parsed as a raw HTML block."""
+        engine = RenderEngine()
+        result = engine.render_markdown_latex("$$x$$\ntext after")
+        
+        assert '<p>$$x$$<br />\ntext after</p>' in result
+    
+    def test_formula_inside_code_span_restored(self):
+        """Test placeholders survive Markdown escaping inside code spans."""
+        engine = RenderEngine()
+        result = engine.render_markdown_latex("Code `a $x$ b` here")
+        
+        assert '<code>a $x$ b</code>' in result
+    
+    def test_nested_delimiters_single_pass(self):
+        """Test a delimiter inside another formula does not leak a placeholder."""
+        engine = RenderEngine()
+        result = engine.render_markdown_latex("Inline \\(a $$b$$\\) end")
+        
+        assert _PLACEHOLDER_PREFIX not in result
+        assert '$a $$b$$$' in result
     
     def test_latex_with_special_formatting(self):
         """Test LaTeX with special formatting like mathrm."""
@@ -94,6 +166,253 @@ class TestLatexRendering:
         assert 'x^2' in result
 
 
+class TestLatexProtection:
+    """Test LaTeX placeholder protection."""
+    
+    def test_plain_text_fast_path(self):
+        """Test text without delimiters is returned untouched."""
+        engine = RenderEngine()
+        text = "Plain prose with a backslash \\ but no math"
+        
+        protected, placeholders = engine._protect_latex(text)
+        
+        assert protected is text
+        assert placeholders == []
+    
+    def test_each_delimiter_detected(self):
+        """Test every delimiter style still reaches the regex scan."""
+        engine = RenderEngine()
+        
+        for text in ["$a$", "\\[a\\]", "\\(a\\)", "\\begin{equation}a\\end{equation}"]:
+            _, placeholders = engine._protect_latex(text)
+            assert len(placeholders) == 1
+    
+    def test_placeholders_store_restored_text(self):
+        """Test each placeholder entry carries its final restored formula."""
+        engine = RenderEngine()
+        
+        protected, placeholders = engine._protect_latex("a $x$ and $$y$$")
+        
+        assert [replacement for _, replacement in placeholders] == ["$x$", "$$y$$"]
+        assert all(placeholder in protected for placeholder, _ in placeholders)
+
+    def test_restore_without_placeholders_returns_input(self):
+        """Test restoring with no recorded formulas leaves the HTML untouched."""
+        engine = RenderEngine()
+        html_text = "<p>no formulas</p>"
+        
+        assert engine._restore_latex(html_text, []) is html_text
+    
+    def test_restore_single_placeholder(self):
+        """Test the single-formula path restores every occurrence."""
+        engine = RenderEngine()
+        protected, placeholders = engine._protect_latex("only $x$")
+        
+        result = engine._restore_latex(f"<p>{protected}</p>", placeholders)
+        
+        assert result == "<p>only $x$</p>"
+    
+    def test_restore_keeps_unknown_placeholders(self):
+        """Test placeholders without a recorded formula are left as-is."""
+        engine = RenderEngine()
+        protected, placeholders = engine._protect_latex("$a$ and $b$")
+        unknown = f"{_PLACEHOLDER_PREFIX}7{_PLACEHOLDER_SUFFIX}"
+        html_text = f"<p>{protected} {unknown}</p>"
+        
+        result = engine._restore_latex(html_text, placeholders)
+        
+        assert result == f"<p>$a$ and $b$ {unknown}</p>"
+
+
+class TestBlockRendering:
+    """Test paragraph-level cached rendering."""
+    
+    @pytest.mark.parametrize("text", [
+        "# Title\n\nIntro $x^2$ **bold**\n\n- a\n- b\n\n- c\n\n```\nx\n\ny\n```\n\nEnd",
+        "- a\n\n\n    continued para",
+        "1. one\n\n\n2. two",
+        "- item\n\n  continued in the same item\n\n\nAfter the list",
+        "    code one\n\n\n    code two\n\n    code three",
+        "a:b ```\n```\n\ncode\n```\n\nafter",
+        "```python\n````\n\nstill code\n````",
+        "Closed \\] then opened \\[\n\nx = 1\n\n\\]",
+        "\t\n\nafter a blank tab line",
+    ], ids=[
+        "mixed", "list_continuation_after_two_blank_lines", "ordered_list_after_two_blank_lines",
+        "indented_list_continuation", "multi_paragraph_indented_code", "inline_backticks_before_fence",
+        "fence_closed_by_same_length_only", "display_math_after_stray_close", "whitespace_only_first_line",
+    ])
+    def test_blocks_match_single_pass(self, text):
+        """Test block rendering produces exactly the HTML of one full conversion."""
+        assert RenderEngine()._render_markdown_latex(text) == single_pass_html(text)
+    
+    @pytest.mark.parametrize("text", [
+        "See [the docs][1].\n\n[1]: http://example.com",
+        "<div>\n\nhello\n\n</div>",
+        "> quote a\n\n> quote b",
+    ], ids=["reference_definition", "raw_html_block", "blockquote"])
+    def test_cross_block_structures_match_single_pass(self, text):
+        """Test structures that span blank lines render as in one full conversion."""
+        md = markdown.Markdown(extensions=RenderEngine.MARKDOWN_EXTENSIONS)
+        expected = md.convert(text)
+        
+        result = RenderEngine().render_markdown_latex(text)
+        
+        assert result == RenderEngine._WRAPPER_PREFIX + expected + RenderEngine._WRAPPER_SUFFIX
+    
+    def test_plain_block_skips_markdown(self, monkeypatch):
+        """Test blocks without Markdown syntax match the parser without running it."""
+        texts = ["Plain answer 42", "  leading space", "中文答案，没有格式", "   "]
+        md = markdown.Markdown(extensions=RenderEngine.MARKDOWN_EXTENSIONS)
+        expected = [md.convert(text) for text in texts]
+        
+        def fail_convert(self, source):
+            raise AssertionError("Markdown.convert should not run")
+        
+        monkeypatch.setattr(markdown.Markdown, 'convert', fail_convert)
+        engine = RenderEngine()
+        
+        assert [engine._convert_block(text) for text in texts] == expected
+    
+    @pytest.mark.parametrize("text", ["    code", "     code here", "    "])
+    def test_indented_block_uses_markdown(self, text):
+        """Test blocks indented four or more spaces still go through Markdown."""
+        md = markdown.Markdown(extensions=RenderEngine.MARKDOWN_EXTENSIONS)
+        
+        assert RenderEngine()._convert_block(text) == md.convert(text)
+    
+    def test_unchanged_blocks_hit_cache(self):
+        """Test editing one paragraph only re-renders that paragraph."""
+        engine = RenderEngine()
+        engine.render_markdown_latex("Block cache one\n\nBlock cache two")
+        
+        hits_before = _render_block.cache_info().hits
+        result = engine.render_markdown_latex("Block cache one\n\nBlock cache edited")
+        
+        assert _render_block.cache_info().hits == hits_before + 1
+        assert 'Block cache edited' in result
+    
+    def test_cached_blocks_match_single_pass(self):
+        """Test blocks cached from other texts never change a later render."""
+        engine = RenderEngine()
+        # 先单独渲染会在其他文本中被合并的片段，使其进入块缓存
+        for text in ["2. two", "    continued", "> quote b", "```"]:
+            engine._render_markdown_latex(text)
+        
+        for text in ["1. one\n\n\n2. two", "- a\n\n\n    continued", "> quote a\n\n> quote b",
+                     "```\ncode\n\n```"]:
+            assert engine._render_markdown_latex(text) == single_pass_html(text)
+    
+    def test_latex_environment_spanning_blank_line(self):
+        """Test environments crossing a blank line stay in one block."""
+        engine = RenderEngine()
+        text = "Intro\n\n\\begin{align}\na &= b\n\nc &= d\n\\end{align}\n\nOutro"
+        
+        blocks = engine._split_blocks(text)
+        
+        assert blocks == ["Intro", "\\begin{align}\na &= b\n\nc &= d\n\\end{align}", "Outro"]
+
+
+class TestRenderCache:
+    """Test memoization of rendered output."""
+    
+    def test_markdown_output_cached(self):
+        """Test re-rendering the same text is served from the cache."""
+        text = "Cached **markdown** $x$"
+        first = RenderEngine().render_markdown_latex(text)
+        
+        hits_before = _render_markdown_latex_cached.cache_info().hits
+        second = RenderEngine().render_markdown_latex(text)
+        
+        assert second == first
+        assert _render_markdown_latex_cached.cache_info().hits == hits_before + 1
+    
+    def test_diff_output_cached(self):
+        """Test re-rendering the same diff text is served from the cache."""
+        text = "Cached <false>old</false><true>new</true>"
+        first = RenderEngine().render_diff_tags(text)
+        
+        hits_before = _render_diff_tags_cached.cache_info().hits
+        second = RenderEngine().render_diff_tags(text)
+        
+        assert second == first
+        assert _render_diff_tags_cached.cache_info().hits == hits_before + 1
+    
+    def test_clear_render_cache(self):
+        """Test clearing empties every shared render cache."""
+        engine = RenderEngine()
+        engine.render_markdown_latex("Clear **me**")
+        engine.render_diff_tags("<true>clear</true>")
+        
+        engine.clear_render_cache()
+        
+        assert _render_markdown_latex_cached.cache_info().currsize == 0
+        assert _render_diff_tags_cached.cache_info().currsize == 0
+        assert _render_block.cache_info().currsize == 0
+
+
+class TestEngineInstance:
+    """Test RenderEngine instance layout."""
+    
+    def test_slotted_instance(self):
+        """Test instances carry only the Markdown processor slot."""
+        engine = RenderEngine()
+        
+        assert not hasattr(engine, '__dict__')
+        with pytest.raises(AttributeError):
+            engine.extra = 1
+    
+    def test_markdown_imported_lazily(self):
+        """Test importing the services package does not load markdown."""
+        code = "import sys, services; print('markdown' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        
+        assert result.stdout.strip() == "False"
+    
+    def test_markdown_built_on_first_conversion(self):
+        """Test constructing an engine is cheap until it converts Markdown."""
+        engine = RenderEngine()
+        assert engine.md is None
+        
+        engine._convert_block("**bold**")
+        
+        assert isinstance(engine.md, markdown.Markdown)
+    
+    def test_threads_use_separate_markdown_instances(self):
+        """Test each rendering thread converts with its own engine."""
+        engines = []
+        
+        def collect():
+            engine = _get_thread_engine()
+            engine._convert_block("**thread**")
+            engines.append(engine)
+        
+        threads = [threading.Thread(target=collect) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert engines[0] is not engines[1]
+        assert engines[0].md is not engines[1].md
+        assert _get_thread_engine() is _get_thread_engine()
+    
+    def test_concurrent_block_rendering(self):
+        """Test blocks rendered from many threads match sequential rendering."""
+        blocks = [f"Item {i} with **bold** and $x_{i}$" for i in range(40)]
+        expected = [RenderEngine()._convert_block(block) for block in blocks]
+        _render_block.cache_clear()
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(_render_block, blocks))
+        
+        assert results == expected
+
+
 class TestDiffTagRendering:
     """Test diff tag styling."""
     
@@ -129,6 +448,25 @@ class TestDiffTagRendering:
         assert 'old' in result
         assert 'new' in result
     
+    def test_nested_tags(self):
+        """Test a tag nested inside the other kind is styled too."""
+        engine = RenderEngine()
+        result = engine.render_diff_tags("<true>new <false>old</false> text</true>")
+        
+        assert result.count('<span') == 2
+        assert '<false>' not in result and '<true>' not in result
+        assert result.index('#388e3c') < result.index('#d32f2f')
+    
+    @pytest.mark.parametrize("text, expected", [
+        ("<true>a<true></true>", _TRUE_SPAN_OPEN + "a<true>" + _SPAN_CLOSE),
+        ("<false><false></false>", _FALSE_SPAN_OPEN + "<false>" + _SPAN_CLOSE),
+        ("<true>open <false>x</false>", "<true>open " + _FALSE_SPAN_OPEN + "x" + _SPAN_CLOSE),
+        ("<false>a<true>b</false>c</true>", _FALSE_SPAN_OPEN + "a<true>b" + _SPAN_CLOSE + "c</true>"),
+    ], ids=["unbalanced_true", "unbalanced_false", "unclosed_then_other_tag", "crossed_tags"])
+    def test_first_open_tag_pairs_with_first_close(self, text, expected):
+        """Test each opening tag pairs with the first following closing tag, as the old regex did."""
+        assert _style_diff_tags(text) == expected
+    
     def test_no_tags(self):
         """Test text without tags."""
         engine = RenderEngine()
@@ -136,6 +474,25 @@ class TestDiffTagRendering:
         
         assert result == "Plain text"
         assert '<span' not in result
+    
+    def test_untagged_text_returned_as_is(self):
+        """Test styling text without diff tags returns the same string object."""
+        text = "Only <b>html</b> and $x$ here"
+        
+        assert _style_diff_tags(text) is text
+    
+    def test_plain_text_skips_protection(self, monkeypatch):
+        """Test text without tags or LaTeX bypasses the placeholder pass."""
+        engine = RenderEngine()
+        
+        def fail_protect(self, text):
+            raise AssertionError("_protect_latex should not run")
+        
+        monkeypatch.setattr(RenderEngine, '_protect_latex', fail_protect)
+        result = engine._render_diff_tags("Plain text")
+        
+        assert result == (engine._DIFF_WRAPPER_PREFIX + "Plain text"
+                          + engine._WRAPPER_SUFFIX)
 
 
 class TestNestedContent:
@@ -181,6 +538,16 @@ class TestWYSIWYGControls:
         assert 'katex' in header
         assert '<link' in header
         assert '<script' in header
+    
+    def test_static_assets_minified(self):
+        """Test static header and controls are shipped without indentation or blank lines."""
+        engine = RenderEngine()
+        
+        for asset in (engine.get_katex_header(), engine.inject_wysiwyg_controls()):
+            lines = asset.split('\n')
+            assert all(line and line == line.strip() for line in lines)
+            assert not any(line.startswith('//') for line in lines)
+        assert 'function renderAllMath()' in engine.get_katex_header()
 
 
 class TestCombinedRendering:
@@ -196,6 +563,56 @@ class TestCombinedRendering:
         assert ('red' in result or '#d32f2f' in result)
         assert ('green' in result or '#388e3c' in result)
     
+    def test_diff_tag_spanning_paragraphs(self):
+        """Test a diff tag crossing blank lines is closed and reopened in each paragraph."""
+        engine = RenderEngine()
+        text = "Intro<false>.\n\nOld para one.\n\n\nOld para two</false>.\n\nEnd."
+        
+        result = engine.render_markdown_latex_with_diff(text)
+        
+        assert result == (
+            RenderEngine._DIFF_WRAPPER_PREFIX
+            + f"<p>Intro{_FALSE_SPAN_OPEN}.{_SPAN_CLOSE}</p>\n"
+            + f"<p>{_FALSE_SPAN_OPEN}Old para one.{_SPAN_CLOSE}</p>\n"
+            + f"<p>{_FALSE_SPAN_OPEN}Old para two{_SPAN_CLOSE}.</p>\n"
+            + "<p>End.</p>"
+            + RenderEngine._WRAPPER_SUFFIX
+        )
+    
+    def test_diff_tag_spanning_list_items(self):
+        """Test a diff tag crossing list items reopens after each item marker."""
+        engine = RenderEngine()
+        text = "<true>Added intro\n\n- first\n- second</true>"
+        
+        result = engine.render_markdown_latex_with_diff(text)
+        
+        assert result == (
+            RenderEngine._DIFF_WRAPPER_PREFIX
+            + f"<p>{_TRUE_SPAN_OPEN}Added intro{_SPAN_CLOSE}</p>\n"
+            + f"<ul>\n<li>{_TRUE_SPAN_OPEN}first{_SPAN_CLOSE}</li>\n"
+            + f"<li>{_TRUE_SPAN_OPEN}second{_SPAN_CLOSE}</li>\n</ul>"
+            + RenderEngine._WRAPPER_SUFFIX
+        )
+    
+    def test_diff_tag_after_stray_close_joins_next_block(self):
+        """Test an open tag after a stray closing tag still pairs across a blank line."""
+        engine = RenderEngine()
+        text = "x</true> then <true>added\n\nmore</true> done"
+        
+        blocks = engine._split_blocks(text)
+        
+        assert blocks == [text]
+    
+    def test_markdown_rendered_inside_diff(self):
+        """Test Markdown is converted as well as diff tags styled."""
+        engine = RenderEngine()
+        text = "Keep <false>**old** $x$</false><true>*new*</true>"
+        result = engine.render_markdown_latex_with_diff(text)
+        
+        assert '<strong>old</strong> $x$</span>' in result
+        assert '<em>new</em></span>' in result
+        assert '<p>' in result
+    
     def test_latex_with_diff(self):
         """Test LaTeX with diff tags."""
         engine = RenderEngine()
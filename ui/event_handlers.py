@@ -4,6 +4,7 @@ Event handlers for UI components.
 Handles user interactions and state updates.
 """
 
+from collections import Counter
 from typing import Dict, Any, Tuple, List, Optional
 import os
 import re
@@ -327,8 +328,10 @@ def generate_stats_html(samples: list) -> str:
     if not samples:
         return '<div style="padding: 8px; margin: 5px 0; background: #f5f5f5; border: 1px solid #1976d2; border-radius: 5px; font-size: 14px; text-align: center;">📊 统计: 待处理 <span style="color: #9E9E9E;">0</span> | 已校正 <span style="color: #4CAF50;">0</span> | 已丢弃 <span style="color: #F44336;">0</span></div>'
     
-    corrected = sum(1 for s in samples if s.status == "corrected")
-    discarded = sum(1 for s in samples if s.status == "discarded")
+    # 单次遍历统计各状态数量（每次导航都会调用）
+    status_counts = Counter(s.status for s in samples)
+    corrected = status_counts["corrected"]
+    discarded = status_counts["discarded"]
     pending = len(samples) - corrected - discarded
     
     return f'''<div style="padding: 8px; margin: 5px 0; background: #f5f5f5; border: 1px solid #1976d2; border-radius: 5px; font-size: 14px; text-align: center;">
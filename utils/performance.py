@@ -14,6 +14,18 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class _OperationStats:
+    """Running aggregates for one operation."""
+    
+    __slots__ = ('count', 'total', 'min', 'max')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+
 class PerformanceMonitor:
     """
     Performance monitoring class for tracking operation times.
@@ -21,7 +33,19 @@ class PerformanceMonitor:
     
     def __init__(self):
         """Initialize performance monitor."""
-        self.metrics: Dict[str, list] = {}
+        # 只保留累计值，记录与查询都是 O(1)，不随调用次数增长
+        self._stats: Dict[str, _OperationStats] = {}
+    
+    @property
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Read-only per-operation statistics, kept for existing callers.
+        
+        This used to be the mutable dict of raw duration lists; individual
+        durations are no longer stored, so it now returns the same mapping
+        as get_all_stats().
+        """
+        return self.get_all_stats()
     
     def record(self, operation: str, duration: float):
         """
@@ -31,10 +55,16 @@ class PerformanceMonitor:
             operation: Name of the operation
             duration: Duration in seconds
         """
-        if operation not in self.metrics:
-            self.metrics[operation] = []
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = _OperationStats()
         
-        self.metrics[operation].append(duration)
+        stats.count += 1
+        stats.total += duration
+        if duration < stats.min:
+            stats.min = duration
+        if duration > stats.max:
+            stats.max = duration
     
     def get_stats(self, operation: str) -> Dict[str, float]:
         """
@@ -46,7 +76,8 @@ class PerformanceMonitor:
         Returns:
             Dictionary with min, max, avg, total, count
         """
-        if operation not in self.metrics or not self.metrics[operation]:
+        stats = self._stats.get(operation)
+        if stats is None:
             return {
                 'min': 0,
                 'max': 0,
@@ -55,13 +86,12 @@ class PerformanceMonitor:
                 'count': 0
             }
         
-        durations = self.metrics[operation]
         return {
-            'min': min(durations),
-            'max': max(durations),
-            'avg': sum(durations) / len(durations),
-            'total': sum(durations),
-            'count': len(durations)
+            'min': stats.min,
+            'max': stats.max,
+            'avg': stats.total / stats.count,
+            'total': stats.total,
+            'count': stats.count
         }
     
     def get_all_stats(self) -> Dict[str, Dict[str, float]]:
@@ -73,12 +103,12 @@ class PerformanceMonitor:
         """
         return {
             operation: self.get_stats(operation)
-            for operation in self.metrics.keys()
+            for operation in self._stats
         }
     
     def clear(self):
         """Clear all recorded metrics."""
-        self.metrics.clear()
+        self._stats.clear()
     
     def log_stats(self, operation: str = None):
         """